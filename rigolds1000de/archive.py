@@ -0,0 +1,250 @@
+"""
+archive.py
+
+An append only file format for logging waveforms.  Captures are stored as the
+    raw bytes that come from the oscilloscope (1 byte per sample) along with
+    the scale, offset and timebase needed to turn them into voltages later.
+
+File layout, all little endian:
+    MAGIC
+    record header (RECORD dtype), raw data (npoints bytes)
+    record header, raw data
+    ...
+
+Records are only ever added to the end, so a file that is being written can
+    be read at the same time, and a capture cut short by a crash only loses
+    the last record: the writer cuts a partly written record off the end when
+    it reopens the file.  The reader maps the file with np.memmap, so opening an
+    archive of hours of captures doesn't read it in, and voltages are only
+    converted for the records that are looked at.  Records are read back as
+    capture.Capture's, whose raw data is a view into the mapped file.
+
+    >>> w = ArchiveWriter("run.rga")
+    >>> w.capture(scope, ["CHAN1", "CHAN2"])
+    >>> w.close()
+    >>> a = ArchiveReader("run.rga")
+    >>> a[0].volts
+"""
+from __future__ import division
+import os
+import numpy as np
+import capture
+
+
+MAGIC = b"RGLARCH1"
+RECORD_MAGIC = b"RCRD"
+
+# scale and offset are the channel's volts/div and offset in volts,
+#     time_scale and time_offset the timebase's, in seconds.
+# sampling_rate is nan if it wasn't known when the record was written.
+RECORD = np.dtype([("magic", "S4"),
+                   ("npoints", "<u4"),
+                   ("timestamp", "<f8"),
+                   ("source", "S8"),
+                   ("scale", "<f8"),
+                   ("offset", "<f8"),
+                   ("time_scale", "<f8"),
+                   ("time_offset", "<f8"),
+                   ("sampling_rate", "<f8")])
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def mapArchive(path):
+    """
+    <path> mapped read only as bytes, after checking that it is an archive.
+    """
+    if os.path.getsize(path) < len(MAGIC):
+        raise ArchiveError("{} is not a capture archive.".format(path))
+    data = np.memmap(path, "B", mode="r")
+    if data[:len(MAGIC)].tobytes() != MAGIC:
+        raise ArchiveError("{} is not a capture archive.".format(path))
+    return data
+
+
+def scanRecords(data, pos):
+    """
+    Index the complete records of the mapped archive <data> from byte <pos> on.
+    returns (RECORD array of their headers, int64 array of the offsets of their
+        raw data, end of the last complete record, True if a bad record header
+        was found at that end)
+    The headers are copied out of <data>, so they don't keep the map open.
+    """
+    size = len(data)
+    headers = []
+    offsets = []
+    bad = False
+    while pos + RECORD.itemsize <= size:
+        header = data[pos:pos + RECORD.itemsize].view(RECORD)[0]
+        if header["magic"] != RECORD_MAGIC:
+            bad = True
+            break
+        start = pos + RECORD.itemsize
+        if start + header["npoints"] > size:
+            break
+        headers.append(header)
+        offsets.append(start)
+        pos = start + int(header["npoints"])
+    return np.array(headers, RECORD), np.array(offsets, np.int64), pos, bad
+
+
+class ArchiveWriter():
+
+    def __init__(self, path):
+        """
+        Opens <path> for appending, writing the file header if it is a new file.
+            Whatever follows the last complete record, e.g. a record cut short
+            by a crash, is cut off first.
+        """
+        self.path = path
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size == 0:
+            self.f = open(path, "wb")
+            self.f.write(MAGIC)
+            return
+        data = mapArchive(path)
+        end = scanRecords(data, len(MAGIC))[2]
+        del data
+        self.f = open(path, "r+b")
+        if end < size:
+            self.f.truncate(end)
+        self.f.seek(end)
+
+    def append(self, cap):
+        """
+        Add a capture.Capture to the end of the archive.
+        """
+        settings = cap.settings
+        header = np.zeros(1, RECORD)
+        header["magic"] = RECORD_MAGIC
+        header["npoints"] = len(cap.raw)
+        header["timestamp"] = cap.timestamp
+        header["source"] = cap.source.encode("ascii")
+        header["scale"] = settings.scale
+        header["offset"] = settings.offset
+        header["time_scale"] = settings.time_scale
+        header["time_offset"] = settings.time_offset
+        header["sampling_rate"] = settings.sampling_rate
+        self.f.write(header.tobytes())
+        self.f.write(np.ascontiguousarray(cap.raw, "B").tobytes())
+
+    def capture(self, scope, sources=("CHAN1", "CHAN2")):
+        """
+        Read <sources> from <scope> (a rigol.Rigol) back to back with
+            Rigol.getCaptures and append them.  Nothing is converted to voltages.
+        """
+        frame = scope.getCaptures(sources)
+        for source in sources:
+            self.append(frame.waveforms[source])
+        self.f.flush()
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader():
+
+    def __init__(self, path):
+        """
+        Maps <path> and indexes its records.  Call refresh to pick up records
+            added since.
+        """
+        self.path = path
+        self.data = None
+        # index (the record headers) and offsets are views of the first
+        #     len(self) entries of these, which grow by doubling, so a refresh
+        #     only copies in the records that are new.
+        self.records = np.zeros(64, RECORD)
+        self.starts = np.zeros(64, np.int64)
+        self.index = self.records[:0]
+        self.offsets = self.starts[:0]
+        self.end = len(MAGIC)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Map the file again and index any records that were added to it.  A last
+            record that is only partly written is left for the next refresh.
+        """
+        self.data = mapArchive(self.path)
+        headers, offsets, end, bad = scanRecords(self.data, self.end)
+        if bad:
+            raise ArchiveError("Bad record at byte {} of {}.".format(end, self.path))
+        self.grow(headers, offsets)
+        self.end = end
+
+    def grow(self, headers, offsets):
+        """
+        Add newly scanned records to the index.
+        """
+        count = len(self)
+        total = count + len(headers)
+        if total > len(self.records):
+            capacity = max(total, 2 * len(self.records))
+            self.records = np.resize(self.records, capacity)
+            self.starts = np.resize(self.starts, capacity)
+        self.records[count:total] = headers
+        self.starts[count:total] = offsets
+        self.index = self.records[:total]
+        self.offsets = self.starts[:total]
+
+    def raw(self, i):
+        """
+        The raw bytes of record <i> as a uint8 view of the file, nothing is copied.
+        """
+        header = self.index[i]
+        start = int(self.offsets[i])
+        return self.data[start:start + int(header["npoints"])]
+
+    def __getitem__(self, i):
+        """
+        Record <i> as a capture.Capture.
+        """
+        header = self.index[i]
+        settings = capture.Settings(float(header["scale"]), float(header["offset"]),
+                                    float(header["time_scale"]), float(header["time_offset"]),
+                                    float(header["sampling_rate"]))
+        return capture.Capture(self.raw(i), header["source"].decode("ascii"),
+                               float(header["timestamp"]), settings)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def timestamps(self):
+        return self.index["timestamp"]
+
+    def select(self, source):
+        """
+        Indices of the records of <source>.
+        """
+        return np.flatnonzero(self.index["source"] == source.encode("ascii"))
+
+    def find(self, timestamp):
+        """
+        Index of the first record taken at or after <timestamp>.
+        """
+        return int(np.searchsorted(self.timestamps(), timestamp))
+
+    def close(self):
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
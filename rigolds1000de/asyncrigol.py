@@ -0,0 +1,157 @@
+"""
+asyncrigol.py
+
+asyncio versions of the usb backend and of Rigol, so that one process can
+    drive several oscilloscopes at once without a thread per scope in the
+    calling code.
+Each instrument gets a single worker thread that does its blocking usb I/O,
+    which keeps commands to one scope in order and off the event loop.
+    Every call takes a timeout, and can be cancelled.  A cancelled call that
+    already reached the scope still finishes in the worker thread, the next
+    call to that scope just waits for it.
+
+Python 3 only.
+
+    async def main():
+        scope = await AsyncRigol.open("sim")
+        data = await scope.getWaveform("CHAN1")
+        await scope.close()
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import rigol
+
+
+class AsyncUsbCon():
+    """
+    Wraps a blocking connection (UsbCon, SimCon, ...) with coroutine versions
+        of its methods.
+    """
+    def __init__(self, dev, timeout=10.0, executor=None):
+        """
+        dev -> the blocking connection.
+        timeout -> default number of seconds to wait for each call, None waits forever.
+        executor -> where the blocking calls run.  Defaults to a new single thread.
+        """
+        self.dev = dev
+        self.timeout = timeout
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+
+    async def call(self, func, *args, timeout=None, **kwargs):
+        """
+        Run func(*args, **kwargs) in the worker thread and wait for it for at
+            most <timeout> seconds (the default timeout if None).
+        Raises asyncio.TimeoutError if it takes longer.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+
+    async def read(self, num=-1, encoding="utf-8", timeout=None):
+        return await self.call(self.dev.read, num, encoding, timeout=timeout)
+
+    async def write(self, message, encoding="utf-8", timeout=None):
+        return await self.call(self.dev.write, message, encoding, timeout=timeout)
+
+    async def ask(self, message, num=-1, encoding="utf-8", timeout=None):
+        return await self.call(self.dev.ask, message, num, encoding, timeout=timeout)
+
+    async def read_raw(self, num=-1, timeout=None):
+        return await self.call(self.dev.read_raw, num, timeout=timeout)
+
+    async def ask_raw(self, msg, num=-1, timeout=None):
+        return await self.call(self.dev.ask_raw, msg, num, timeout=timeout)
+
+    async def ask_many(self, messages, encoding="utf-8", timeout=None):
+        return await self.call(self.dev.ask_many, messages, encoding, timeout=timeout)
+
+    async def ask_block(self, message, out=None, done=None, timeout=None):
+        return await self.call(self.dev.ask_block, message, out, done, timeout=timeout)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class AsyncRigol():
+    """
+    An async facade over Rigol.  Every method of Rigol is available as a
+        coroutine with the same name and arguments plus an optional timeout,
+        e.g. await scope.getWaveform("CHAN1", timeout=2).
+    Attributes that aren't methods, like volt1_scale, are returned as is.
+        Rigol asks for its settings attributes the first time one is used,
+        which would block the event loop, so open loads them in the worker
+        thread.  For a scope that hasn't loaded them yet, reading one raises
+        AttributeError; await scope.refreshAttributes() first.
+    """
+    def __init__(self, scope, timeout=10.0, executor=None):
+        """
+        scope -> a connected rigol.Rigol.  Use AsyncRigol.open to connect
+            without blocking the event loop.
+        """
+        self.scope = scope
+        self.con = AsyncUsbCon(scope.dev, timeout=timeout, executor=executor)
+
+    @classmethod
+    async def open(cls, backend, *args, timeout=10.0, **kwargs):
+        """
+        Connect to a scope, and load its settings attributes, in a worker
+            thread.  Arguments are the same as for rigol.Rigol.
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.get_event_loop()
+
+        def connect():
+            scope = rigol.Rigol(backend, *args, **kwargs)
+            scope.refreshAttributes()
+            return scope
+        scope = await asyncio.wait_for(loop.run_in_executor(executor, connect), timeout)
+        return cls(scope, timeout=timeout, executor=executor)
+
+    def __getattr__(self, name):
+        if name in ("scope", "con"):
+            raise AttributeError(name)
+        if name in rigol.Rigol.lazy_attributes and name not in vars(self.scope):
+            # getting it would ask the scope from the event loop's thread
+            raise AttributeError("{} hasn't been loaded, await refreshAttributes() first.".format(name))
+        attr = getattr(self.scope, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args, timeout=None, **kwargs):
+            return await self.con.call(attr, *args, timeout=timeout, **kwargs)
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+
+    async def iterWaveforms(self, *args, timeout=None, **kwargs):
+        """
+        Async version of Rigol.iterWaveforms, each frame is captured in the
+            worker thread.
+        """
+        frames = self.scope.iterWaveforms(*args, **kwargs)
+        done = object()
+        try:
+            while True:
+                frame = await self.con.call(next, frames, done, timeout=timeout)
+                if frame is done:
+                    return
+                yield frame
+        finally:
+            # the worker thread may still be inside the generator, so close it there
+            self.con.executor.submit(frames.close)
+
+    async def close(self):
+        """
+        Wait for anything still running on the scope, then stop the worker thread.
+        """
+        await self.con.call(lambda: None, timeout=None)
+        self.con.close()
+
+
+async def gather(scopes, method, *args, **kwargs):
+    """
+    Call <method> on every AsyncRigol in <scopes> at the same time.
+    returns the results in the same order as <scopes>.
+    """
+    return await asyncio.gather(*[getattr(scope, method)(*args, **kwargs) for scope in scopes])
@@ -0,0 +1,210 @@
+"""
+bench.py
+
+Benchmarks for the acquisition path of rigol.py, run against the simulated
+    scope in simcon.py so that the numbers only depend on this code and the
+    simulated bus settings, never on what is plugged in.
+
+Reports
+    - per call latency percentiles of the ask* getters, askWaveformData and
+        getWaveform
+    - waveforms/sec for the NORM, MAX and RAW waveformPointsMode settings
+    - decoded bytes/sec of convertVoltages
+    - time to connect, and to connect and read a first waveform
+
+Use --json to save a run and --compare to check a run against a saved one,
+    e.g. the results from the previous release.
+
+    $ python bench.py --json before.json
+    $ python bench.py --compare before.json
+"""
+from __future__ import division
+from __future__ import print_function
+import argparse
+import json
+import platform
+from timeit import default_timer as clock
+import numpy as np
+import rigol
+
+
+PERCENTILES = [50, 90, 99]
+
+
+def timeCalls(func, repeat):
+    """
+    Call <func> <repeat> times and return the duration of each call in seconds.
+    """
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = clock()
+        func()
+        times[i] = clock() - start
+    return times
+
+
+def summarize(times, nbytes=None):
+    """
+    Latency percentiles in ms, plus calls/sec (and bytes/sec if <nbytes> is the
+        number of bytes handled per call).
+    """
+    summary = {"p{}_ms".format(p): float(np.percentile(times, p) * 1e3) for p in PERCENTILES}
+    summary["mean_ms"] = float(times.mean() * 1e3)
+    summary["per_sec"] = float(len(times) / times.sum()) if times.sum() else float("inf")
+    if nbytes is not None:
+        summary["bytes_per_sec"] = summary["per_sec"] * nbytes
+    return summary
+
+
+def benchGetters(r, repeat):
+    getters = {
+        "askChannelScale": lambda: r.askChannelScale(1),
+        "askChannelOffset": lambda: r.askChannelOffset(1),
+        "askTimebaseScale": lambda: r.askTimebaseScale(),
+        "askTimebaseOffset": lambda: r.askTimebaseOffset(),
+        "askTriggerStatus": r.askTriggerStatus,
+        "measureVpp": lambda: r.measureVpp(1),
+        "refreshAttributes": r.refreshAttributes,
+    }
+    return {name: summarize(timeCalls(func, repeat)) for name, func in getters.items()}
+
+
+def benchWaveforms(r, repeat):
+    """
+    The scope only hands over its full memory in MAX and RAW mode while it is
+        stopped, so it is stopped for those.
+    """
+    results = {}
+    for mode in ["NORM", "MAX", "RAW"]:
+        if mode == "NORM":
+            r.run()
+        else:
+            r.stop()
+        r.waveformPointsMode(mode)
+        npoints = len(r.askWaveformData("CHAN1"))
+        results[mode] = {
+            "points": npoints,
+            "askWaveformData": summarize(timeCalls(lambda: r.askWaveformData("CHAN1"), repeat), npoints),
+            "getWaveform": summarize(timeCalls(lambda: r.getWaveform("CHAN1"), repeat), npoints),
+        }
+    r.run()
+    r.waveformPointsMode("NORM")
+    return results
+
+
+def benchConvert(r, repeat, npoints):
+    raw = np.random.RandomState(0).randint(0, 256, npoints).astype(np.uint8)
+    times = timeCalls(lambda: r.convertVoltages(raw, "CHAN1"), repeat)
+    return summarize(times, npoints)
+
+
+def benchConnect(repeat, latency, bandwidth, cache):
+    """
+    Connecting, and connecting followed by a first getWaveform, which is what a
+        script that makes one short capture pays before it gets any data.
+    """
+    connect = lambda: rigol.Rigol("sim", latency=latency, bandwidth=bandwidth, cache=cache)
+    return {
+        "connect": summarize(timeCalls(connect, repeat)),
+        "firstWaveform": summarize(timeCalls(lambda: connect().getWaveform("CHAN1"), repeat)),
+    }
+
+
+def run(repeat=100, latency=.001, bandwidth=600e3, convert_points=1048576, cache=False):
+    """
+    Run every benchmark and return the results as a dictionary.
+    The default latency and bandwidth are roughly what a DS1102E on USB 1.1
+        full speed manages.
+    """
+    r = rigol.Rigol("sim", latency=latency, bandwidth=bandwidth, cache=cache)
+    return {
+        "config": {
+            "repeat": repeat,
+            "latency": latency,
+            "bandwidth": bandwidth,
+            "cache": cache,
+            "convert_points": convert_points,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "getters": benchGetters(r, repeat),
+        "waveforms": benchWaveforms(r, repeat),
+        "convertVoltages": benchConvert(r, repeat, convert_points),
+        "connect": benchConnect(repeat, latency, bandwidth, cache),
+    }
+
+
+def flatten(results, prefix=""):
+    """
+    {"a": {"b": 1}} -> {"a.b": 1}, leaving out the config section.
+    """
+    flat = {}
+    for key, value in results.items():
+        if key == "config":
+            continue
+        name = prefix + key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def compare(new, old, tolerance=.1):
+    """
+    Returns [(metric, old, new, ratio)] for every metric that got more than
+        <tolerance> worse.  Latencies are worse when they grow, rates when they
+        shrink.  Only medians and rates are compared, the tail percentiles are
+        too noisy from run to run.
+    """
+    new_flat = flatten(new)
+    old_flat = flatten(old)
+    regressions = []
+    for metric, new_value in sorted(new_flat.items()):
+        old_value = old_flat.get(metric)
+        if not old_value or not metric.endswith(("p50_ms", "per_sec")):
+            continue
+        ratio = new_value / old_value
+        if metric.endswith("_ms"):
+            worse = ratio > 1 + tolerance
+        else:
+            worse = ratio < 1 - tolerance
+        if worse:
+            regressions.append((metric, old_value, new_value, ratio))
+    return regressions
+
+
+def report(results):
+    print("config: {}".format(results["config"]))
+    for metric, value in sorted(flatten(results).items()):
+        print("{:<55} {:>14.4f}".format(metric, value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rigol.py acquisition path.")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=.001, help="simulated seconds per command")
+    parser.add_argument("--bandwidth", type=float, default=600e3, help="simulated bus bytes/sec")
+    parser.add_argument("--cache", action="store_true", help="enable the settings cache")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=.1)
+    args = parser.parse_args()
+    results = run(repeat=args.repeat, latency=args.latency, bandwidth=args.bandwidth, cache=args.cache)
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            old = json.load(f)
+        if old["config"]["latency"] != args.latency or old["config"]["bandwidth"] != args.bandwidth:
+            print("warning: {} was run with different bus settings".format(args.compare))
+        regressions = compare(results, old, args.tolerance)
+        for metric, old_value, new_value, ratio in regressions:
+            print("SLOWER {:<48} {:.4f} -> {:.4f} ({:.2f}x)".format(metric, old_value, new_value, ratio))
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+capture.py
+
+Containers for data acquired from the oscilloscope.
+
+Capture holds one waveform as the raw bytes read from the scope, 1 byte per
+    sample, along with a snapshot of the settings it was taken with.  Volts
+    and times are worked out the first time they are asked for, from the
+    snapshot, so a capture is never scaled with settings that changed after
+    it was taken.
+
+    >>> c = r.getCapture("CHAN1")
+    >>> c.volts, c.time
+"""
+from __future__ import division
+from collections import namedtuple
+import numpy as np
+import timeaxis
+
+
+# index - position of the frame in the stream it came from
+# timestamp - time.time() when the acquisition of the frame started
+# waveforms - {source: numpy array of voltages}, or {source: Capture} from
+#     Rigol.getCaptures.  A Capture converts to its volts wherever numpy takes
+#     an array, so code written for either can be given both.
+Frame = namedtuple("Frame", ["index", "timestamp", "waveforms"])
+
+# A set of Frames captured from several oscilloscopes at the same time.
+# index - position of the set in the stream it came from
+# timestamp - mean of the Frame timestamps
+# skew - latest minus earliest Frame timestamp, in seconds
+# frames - {serial number: Frame}
+FrameSet = namedtuple("FrameSet", ["index", "timestamp", "skew", "frames"])
+
+# The settings a Capture was taken with.
+# scale, offset - channel volts/div and offset in volts, 0 for sources that aren't channels
+# time_scale, time_offset - timebase in seconds
+# sampling_rate - samples/sec, nan if it wasn't asked for (normal 600 point records don't need it)
+Settings = namedtuple("Settings", ["scale", "offset", "time_scale", "time_offset", "sampling_rate"])
+
+
+def voltageAffine(scale, offset):
+    """
+    Same conversion as Rigol.voltageAffine, from a channel's scale and offset.
+    returns (gain, bias) with volts = gain * data + bias
+    """
+    return -scale / 25, (255 - 130) * scale / 25 - offset
+
+
+class Capture(object):
+
+    __slots__ = ("raw", "source", "timestamp", "settings", "_volts", "_time")
+
+    def __init__(self, raw, source, timestamp, settings):
+        """
+        raw -> the waveform data as read from the scope, anything np.frombuffer takes.
+        source -> "CHAN1", "CHAN2", ...
+        timestamp -> time.time() when it was read.
+        settings -> a Settings.
+        """
+        self.raw = np.frombuffer(raw, "B") if not isinstance(raw, np.ndarray) else raw
+        self.source = source
+        self.timestamp = timestamp
+        self.settings = settings
+        self._volts = None
+        self._time = None
+
+    def getVolts(self, dtype=np.float64):
+        """
+        A new array of the capture converted to voltages.  Sources other than
+            CHAN1 and CHAN2 have no scale, so their raw values are returned as <dtype>.
+        """
+        out = self.raw.astype(dtype)
+        if self.source.startswith("CHAN"):
+            gain, bias = voltageAffine(self.settings.scale, self.settings.offset)
+            out *= gain
+            out += bias
+        return out
+
+    @property
+    def volts(self):
+        """
+        The capture in volts, converted once and kept.
+        """
+        if self._volts is None:
+            self._volts = self.getVolts()
+        return self._volts
+
+    @property
+    def time(self):
+        """
+        The times of the samples as a timeaxis.TimeAxis.
+        """
+        if self._time is None:
+            s = self.settings
+            n = len(self.raw)
+            if n == timeaxis.SCREEN_POINTS:
+                self._time = timeaxis.screenAxis(s.time_scale, s.time_offset)
+            elif s.sampling_rate == s.sampling_rate and s.sampling_rate > 0:
+                self._time = timeaxis.centeredAxis(1 / s.sampling_rate, s.time_offset, n)
+            else:
+                # without a sampling rate, assume the record spans the screen
+                step = s.time_scale * timeaxis.SCREEN_DIVISIONS / n
+                self._time = timeaxis.centeredAxis(step, s.time_offset, n)
+        return self._time
+
+    def forget(self):
+        """
+        Drop the cached volts and time to get back to 1 byte per sample.
+        """
+        self._volts = None
+        self._time = None
+
+    def __array__(self, dtype=None, copy=None):
+        # lets a Capture stand in for its volts, e.g. in np.vstack or measure.measure
+        volts = self.volts
+        if dtype is not None and np.dtype(dtype) != volts.dtype:
+            return volts.astype(dtype)
+        return volts.copy() if copy else volts
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __repr__(self):
+        return "Capture({}, {} points, timestamp={!r})".format(self.source, len(self.raw), self.timestamp)
@@ -0,0 +1,68 @@
+"""
+decimate.py
+
+Min/max decimation of waveforms for display.  A long memory capture has far
+    more points than there are pixels to draw them in, so each pixel column
+    is reduced to the smallest and largest sample that falls in it.  Unlike
+    just taking every nth sample, this keeps peaks and glitches visible.
+"""
+from __future__ import division
+import numpy as np
+
+
+def minMaxEnvelope(data, width):
+    """
+    Split <data> into <width> equal bins (the last bin takes the leftovers)
+        and return (lows, highs), the min and max of each bin.
+    If there aren't more samples than bins, data is returned as both.
+    """
+    data = np.asarray(data)
+    n = len(data)
+    if n <= width:
+        return data, data
+    per_bin = n // width
+    body = data[:per_bin * width].reshape(width, per_bin)
+    lows = body.min(axis=1)
+    highs = body.max(axis=1)
+    tail = data[per_bin * width:]
+    if len(tail):
+        lows[-1] = min(lows[-1], tail.min())
+        highs[-1] = max(highs[-1], tail.max())
+    return lows, highs
+
+
+def decimate(data, width, x=None):
+    """
+    Reduce <data> to about 2 * <width> points for plotting as a line.  The
+        min and max of each bin are interleaved in the order they occur, so the
+        line sweeps the full range of every pixel column.
+    x - the x values of data, e.g. from Rigol.getTimebase.  If given, the x
+        values of the samples that were kept are returned as well.  It may be
+        longer than data.
+    returns y, or (x, y) if x was given.
+    """
+    data = np.asarray(data)
+    n = len(data)
+    if n <= 2 * width:
+        return data if x is None else (np.asarray(x[:n]), data)
+    per_bin = n // width
+    body = data[:per_bin * width].reshape(width, per_bin)
+    offsets = np.arange(width) * per_bin
+    imin = body.argmin(axis=1) + offsets
+    imax = body.argmax(axis=1) + offsets
+    # keep each bin's two points in time order
+    first = np.minimum(imin, imax)
+    second = np.maximum(imin, imax)
+    index = np.empty(2 * width, np.intp)
+    index[0::2] = first
+    index[1::2] = second
+    tail = data[per_bin * width:]
+    if len(tail):
+        tail_index = np.sort([tail.argmin(), tail.argmax()]) + per_bin * width
+        index = np.concatenate([index, tail_index])
+    y = data[index]
+    if x is None:
+        return y
+    # a TimeAxis (or array) can give just the kept times, lists are converted
+    take = getattr(x, "take", None)
+    return (take(index) if take is not None else np.asarray(x)[index]), y
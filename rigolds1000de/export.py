@@ -0,0 +1,225 @@
+"""
+export.py
+
+Streams capture sessions into HDF5 for analysis, with a Parquet index of the
+    captures alongside it.  Captures are buffered a chunk at a time and
+    written as they fill, so a long run never has to fit in memory.
+
+HDF5 layout, one group per source and record length:
+    /CHAN1/600/raw          uint8 (captures, 600), chunked and compressed, in
+                            chunks of at most CHUNK_BYTES
+    /CHAN1/600/timestamp    float64 (captures,)
+    /CHAN1/600/scale        ... offset, time_scale, time_offset, vpp
+Raw data is stored as it comes from the scope, volts = gain * raw + bias with
+    gain = -scale / 25 and bias = 5 * scale - offset (see Rigol.voltageAffine).
+    Pass a dtype to store voltages instead.
+
+The Parquet index has a row per capture: capture, timestamp, source, npoints,
+    scale, offset, time_scale, time_offset, vpp, and dataset/row to find the
+    waveform in the HDF5 file.
+
+Needs h5py, and pyarrow for the index.
+
+    >>> with SessionExporter("run.h5", "run.parquet") as ex:
+    ...     for i in range(1000):
+    ...         ex.capture(scope, ["CHAN1", "CHAN2"])
+"""
+from __future__ import division
+import numpy as np
+import archive
+import capture
+try:
+    import h5py
+except ImportError:
+    h5py = None
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+META = ["timestamp", "scale", "offset", "time_scale", "time_offset", "vpp"]
+# largest HDF5 chunk of waveform data.  Each chunk is compressed as a whole and
+#     read whole to get any one capture out of it, so a chunk of 64 long memory
+#     captures (64MB) would make reading one capture back very slow.
+CHUNK_BYTES = 1 << 20
+
+
+class SessionExporter():
+
+    def __init__(self, h5_path, index_path=None, chunk_captures=64, compression="gzip",
+                 compression_opts=4, dtype=None, index_group_rows=65536):
+        """
+        h5_path -> HDF5 file to write, it is created or truncated.
+        index_path -> Parquet file for the index, or None for no index.
+        chunk_captures -> most captures per HDF5 chunk, fewer for records so
+            long that this many would be over CHUNK_BYTES.  A chunk's worth of
+            captures of each source is held in memory before being written.
+        compression, compression_opts -> HDF5 filter, see h5py's create_dataset.
+        dtype -> store voltages of this type (e.g. np.float32) instead of raw bytes.
+        index_group_rows -> rows per Parquet row group.  Index rows are small, so
+            many are buffered to keep the row groups (and their per group
+            metadata and column statistics) few.
+        """
+        if h5py is None:
+            raise ImportError("h5py is required to export to HDF5.")
+        if index_path is not None and pq is None:
+            raise ImportError("pyarrow is required to write a Parquet index.")
+        self.h5 = h5py.File(h5_path, "w")
+        self.chunk_captures = chunk_captures
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.dtype = dtype
+        self.index_group_rows = index_group_rows
+        self.pending = {}
+        self.count = 0
+        self.index_rows = []
+        self.index = None
+        if index_path is not None:
+            self.schema = self.indexSchema()
+            self.index = pq.ParquetWriter(index_path, self.schema)
+
+    def indexSchema(self):
+        return pa.schema([("capture", pa.int64()),
+                          ("timestamp", pa.float64()),
+                          ("source", pa.string()),
+                          ("npoints", pa.int64()),
+                          ("scale", pa.float64()),
+                          ("offset", pa.float64()),
+                          ("time_scale", pa.float64()),
+                          ("time_offset", pa.float64()),
+                          ("vpp", pa.float64()),
+                          ("dataset", pa.string()),
+                          ("row", pa.int64())])
+
+    def add(self, cap):
+        """
+        Add a capture.Capture, e.g. from Rigol.getCapture or an archive.
+        """
+        raw = cap.raw
+        source = cap.source
+        s = cap.settings
+        npoints = len(raw)
+        # the scope's full scale is 10 divisions of 25 counts
+        vpp = (int(raw.max()) - int(raw.min())) * s.scale / 25 if npoints and source.startswith("CHAN") else float("nan")
+        name = "{}/{}".format(source, npoints)
+        rows = self.pending.setdefault(name, [])
+        group = self.h5.get(name)
+        row = (len(group["timestamp"]) if group is not None else 0) + len(rows)
+        rows.append((np.array(raw, "B"), (cap.timestamp, s.scale, s.offset, s.time_scale, s.time_offset, vpp)))
+        if self.index is not None:
+            self.index_rows.append((self.count, cap.timestamp, source, npoints, s.scale, s.offset,
+                                    s.time_scale, s.time_offset, vpp, name, row))
+        self.count += 1
+        if len(rows) >= self.chunkShape(npoints)[0]:
+            self.writeChunk(name)
+        if len(self.index_rows) >= self.index_group_rows:
+            self.writeIndex()
+
+    def capture(self, scope, sources=("CHAN1", "CHAN2")):
+        """
+        Read <sources> from <scope> (a rigol.Rigol) back to back and add them.
+        """
+        frame = scope.getCaptures(sources)
+        for source in sources:
+            self.add(frame.waveforms[source])
+
+    def chunkShape(self, npoints):
+        """
+        (captures, points) of the HDF5 chunks of records <npoints> long, kept
+            under CHUNK_BYTES.  A record too long for one chunk is split along
+            its points.
+        """
+        itemsize = np.dtype("u1" if self.dtype is None else self.dtype).itemsize
+        points = max(1, min(npoints, CHUNK_BYTES // itemsize))
+        captures = max(1, min(self.chunk_captures, CHUNK_BYTES // (points * itemsize)))
+        return captures, points
+
+    def group(self, name, npoints):
+        """
+        The HDF5 group for <name>, made with empty resizable datasets the first time.
+        """
+        group = self.h5.get(name)
+        if group is not None:
+            return group
+        group = self.h5.create_group(name)
+        dtype = "u1" if self.dtype is None else self.dtype
+        group.create_dataset("raw" if self.dtype is None else "volts", shape=(0, npoints),
+                             maxshape=(None, npoints), dtype=dtype,
+                             chunks=self.chunkShape(npoints),
+                             compression=self.compression, compression_opts=self.compression_opts)
+        for key in META:
+            group.create_dataset(key, shape=(0,), maxshape=(None,), dtype="f8",
+                                 chunks=(self.chunk_captures,))
+        return group
+
+    def writeChunk(self, name):
+        rows = self.pending.pop(name, [])
+        if not rows:
+            return
+        data = np.vstack([raw for raw, _ in rows])
+        meta = np.array([m for _, m in rows], "f8")
+        group = self.group(name, data.shape[1])
+        if self.dtype is None:
+            waves = group["raw"]
+        else:
+            waves = group["volts"]
+            if name.startswith("CHAN"):
+                gain, bias = capture.voltageAffine(meta[:, 1:2], meta[:, 2:3])
+                data = (data * gain + bias).astype(self.dtype)
+            else:
+                data = data.astype(self.dtype)
+        start = waves.shape[0]
+        end = start + len(data)
+        waves.resize(end, axis=0)
+        waves[start:end] = data
+        for i, key in enumerate(META):
+            group[key].resize(end, axis=0)
+            group[key][start:end] = meta[:, i]
+
+    def writeIndex(self):
+        if self.index is None or not self.index_rows:
+            return
+        columns = list(zip(*self.index_rows))
+        table = pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+                                     schema=self.schema)
+        self.index.write_table(table)
+        self.index_rows = []
+
+    def flush(self):
+        """
+        Write everything that is buffered.
+        """
+        for name in list(self.pending):
+            self.writeChunk(name)
+        self.writeIndex()
+        self.h5.flush()
+
+    def close(self):
+        self.flush()
+        self.h5.close()
+        if self.index is not None:
+            self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def exportArchive(archive_path, h5_path, index_path=None, **kwargs):
+    """
+    Convert a capture archive (see archive.py) to HDF5 and a Parquet index.
+        Extra keyword arguments are passed on to SessionExporter.
+    """
+    reader = archive.ArchiveReader(archive_path)
+    exporter = SessionExporter(h5_path, index_path, **kwargs)
+    try:
+        for cap in reader:
+            exporter.add(cap)
+    finally:
+        exporter.close()
+        reader.close()
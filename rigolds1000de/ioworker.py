@@ -0,0 +1,275 @@
+"""
+ioworker.py
+
+Gives one thread sole use of the oscilloscope.  Everything else hands it
+    commands through a priority queue and gets a concurrent.futures.Future
+    back, instead of queueing on the connection lock in whatever order the
+    threads happen to wake up.
+
+Commands run in order of priority, then in the order they were sent:
+    INTERACTIVE - setters (writes), so a settings change from the GUI goes
+        ahead of anything still waiting in the queue.
+    QUERY - ordinary queries.
+    BULK - waveform reads.
+A command that has already started isn't interrupted, the scope can't take a
+    new command in the middle of sending a waveform, but nothing queued behind
+    it can hold up a setter.  A query that is sent again while the same query
+    is still waiting in the queue isn't sent twice, both callers get the same
+    Future.
+
+    >>> worker = IOWorker(uc.UsbCon(idProduct, idVendor))
+    >>> future = worker.ask(":CHAN1:SCAL?")
+    >>> future.result()
+
+WorkerCon puts the same worker behind the blocking UsbCon interface, which is
+    what Rigol uses with threaded=True.  Holding its lock borrows the scope
+    from the worker, so a series of commands (like Rigol.getWaveforms) still
+    runs without anything in between.  The borrow waits its turn in the queue
+    like any other job, at BULK priority unless asked otherwise, so a thread
+    reading waveforms in a loop can't keep queries and setters waiting.
+
+Needs concurrent.futures (the futures backport on python 2).
+"""
+import itertools
+import threading
+try:
+    import Queue as queue  # python2
+except ImportError:
+    import queue  # python3
+try:
+    from concurrent.futures import Future
+except ImportError:
+    Future = None
+
+
+INTERACTIVE = 0
+QUERY = 1
+BULK = 2
+STOP = 99
+
+
+class IOWorker():
+
+    def __init__(self, dev):
+        """
+        dev -> the connection (UsbCon, SimCon, ...) the worker thread takes over.
+        """
+        if Future is None:
+            raise ImportError("concurrent.futures is required for the I/O worker.")
+        self.dev = dev
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="rigol-io")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, priority, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) to run in the worker thread.
+        returns a Future of its result.
+        """
+        return self.enqueue(priority, None, func, args, kwargs)
+
+    def enqueue(self, priority, key, func, args, kwargs):
+        """
+        Queue a job.  Jobs with the same key that are still waiting share a Future.
+        """
+        with self.pending_lock:
+            if key is not None and key in self.pending:
+                return self.pending[key]
+            future = Future()
+            if key is not None:
+                self.pending[key] = future
+            self.queue.put((priority, next(self.order), (future, key, func, args, kwargs)))
+        return future
+
+    def run(self):
+        while True:
+            priority, _, job = self.queue.get()
+            if job is None:
+                return
+            future, key, func, args, kwargs = job
+            if key is not None:
+                with self.pending_lock:
+                    self.pending.pop(key, None)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def write(self, message, encoding="utf-8", priority=INTERACTIVE):
+        return self.submit(priority, self.dev.write, message, encoding)
+
+    def ask(self, message, num=-1, encoding="utf-8", priority=QUERY):
+        return self.enqueue(priority, ("ask", message, num, encoding), self.dev.ask,
+                            (message, num, encoding), {})
+
+    def ask_raw(self, msg, num=-1, priority=BULK):
+        return self.enqueue(priority, ("ask_raw", msg, num), self.dev.ask_raw, (msg, num), {})
+
+    def ask_many(self, messages, encoding="utf-8", priority=QUERY):
+        key = ("ask_many", tuple(messages), encoding)
+        return self.enqueue(priority, key, self.dev.ask_many, (messages, encoding), {})
+
+    def ask_block(self, message, out=None, done=None, priority=BULK):
+        """
+        The whole block is read as one job, see UsbCon.ask_block.
+        """
+        return self.submit(priority, self.dev.ask_block, message, out, done)
+
+    def read(self, num=-1, encoding="utf-8", priority=QUERY):
+        return self.submit(priority, self.dev.read, num, encoding)
+
+    def read_raw(self, num=-1, priority=QUERY):
+        return self.submit(priority, self.dev.read_raw, num)
+
+    def close(self, wait=True):
+        """
+        Stop the worker thread once everything already queued has run.
+        """
+        self.queue.put((STOP, next(self.order), None))
+        if wait:
+            self.thread.join()
+
+
+class WorkerLock():
+    """
+    Lock of a WorkerCon.  The thread that holds it has the scope to itself:
+        the worker thread waits, and the holder's commands run straight away
+        in the holder's own thread.
+    Taking the lock is itself a job in the worker's queue, so threads waiting
+        for it are let in by priority like any other job, and the worker
+        running one job at a time is what keeps two of them from holding it.
+    priority -> where in the queue acquiring the lock waits, by default BULK
+        since the lock is taken for waveform reads.  Jobs of a higher priority
+        that are already queued run first.
+    """
+    def __init__(self, worker, priority=BULK):
+        self.worker = worker
+        self.priority = priority
+        self.owner = None
+        self.depth = 0
+        self.returned = None
+
+    def lend(self, lent, returned):
+        # runs in the worker thread, which does nothing else until it is given back
+        lent.set()
+        returned.wait()
+
+    def held(self):
+        """
+        True in the thread holding the lock, and in the worker thread, which
+            always has the scope.
+        """
+        current = threading.current_thread()
+        return current is self.owner or current is self.worker.thread
+
+    def acquire(self, blocking=True, priority=None):
+        """
+        priority -> overrides self.priority for this borrow.
+        blocking -> if False, give up unless the worker is free to lend the
+            scope straight away.
+        """
+        current = threading.current_thread()
+        if current is self.worker.thread:
+            return True
+        if current is self.owner:
+            self.depth += 1
+            return True
+        if not blocking and self.owner is not None:
+            return False
+        lent = threading.Event()
+        returned = threading.Event()
+        future = self.worker.submit(self.priority if priority is None else priority,
+                                    self.lend, lent, returned)
+        if not blocking and not lent.wait(.01) and future.cancel():
+            return False
+        lent.wait()
+        self.owner = current
+        self.depth = 1
+        self.returned = returned
+        return True
+
+    def release(self):
+        current = threading.current_thread()
+        if current is self.worker.thread:
+            return
+        if current is not self.owner:
+            raise RuntimeError("Releasing a WorkerLock that isn't held.")
+        self.depth -= 1
+        if self.depth == 0:
+            self.owner = None
+            self.returned.set()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class WorkerCon():
+    """
+    The blocking UsbCon interface, carried out by an IOWorker.  Each call waits
+        for its Future, unless the calling thread holds the lock, in which case
+        it goes straight to the connection.
+    Anything else (max_compound, instr, ...) is looked up on the connection.
+    """
+    def __init__(self, dev, worker=None):
+        """
+        dev -> the connection the worker takes over.
+        worker -> an IOWorker of dev, a new one if None.
+        """
+        self.dev = dev
+        self.worker = worker or IOWorker(dev)
+        self.lock = WorkerLock(self.worker)
+
+    def __getattr__(self, name):
+        if name in ("dev", "worker", "lock"):
+            raise AttributeError(name)
+        return getattr(self.dev, name)
+
+    def read(self, num=-1, encoding="utf-8"):
+        if self.lock.held():
+            return self.dev.read(num, encoding)
+        return self.worker.read(num, encoding).result()
+
+    def write(self, message, encoding="utf-8"):
+        if self.lock.held():
+            return self.dev.write(message, encoding)
+        return self.worker.write(message, encoding).result()
+
+    def ask(self, message, num=-1, encoding="utf-8"):
+        if self.lock.held():
+            return self.dev.ask(message, num, encoding)
+        return self.worker.ask(message, num, encoding).result()
+
+    def read_raw(self, num=-1):
+        if self.lock.held():
+            return self.dev.read_raw(num)
+        return self.worker.read_raw(num).result()
+
+    def ask_raw(self, msg, num=-1):
+        if self.lock.held():
+            return self.dev.ask_raw(msg, num)
+        return self.worker.ask_raw(msg, num).result()
+
+    def ask_many(self, messages, encoding="utf-8"):
+        if self.lock.held():
+            return self.dev.ask_many(messages, encoding)
+        return self.worker.ask_many(messages, encoding).result()
+
+    def ask_block(self, message, out=None, done=None):
+        if self.lock.held():
+            return self.dev.ask_block(message, out, done)
+        return self.worker.ask_block(message, out, done).result()
+
+    def close(self):
+        self.worker.close()
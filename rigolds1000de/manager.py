@@ -0,0 +1,134 @@
+"""
+manager.py
+
+Controls a rack of DS1000D/E oscilloscopes as a group.  Every scope gets its
+    own Rigol, keyed by its serial number, and acquisitions are fanned out
+    over a thread pool so that all of the scopes capture at the same time.
+
+    >>> m = RigolManager.discover()
+    >>> fs = m.acquire(["CHAN1"])
+    >>> fs.frames["DS1ET000000001"].waveforms["CHAN1"]
+"""
+from __future__ import division
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer as clock
+import time
+import numpy as np
+import rigol
+import capture
+import usbcon as uc
+
+
+RIGOL_VENDOR = 0x1ab1
+DS1000_PRODUCT = 0x0588
+
+
+class RigolManager():
+
+    def __init__(self, scopes):
+        """
+        scopes -> {serial number: rigol.Rigol}
+        """
+        self.scopes = scopes
+        self.pool = ThreadPool(max(1, len(scopes)))
+        self.stats = dict((serial, {"frames": 0, "bytes": 0, "seconds": 0.0}) for serial in scopes)
+        self.index = 0
+
+    @classmethod
+    def discover(cls, idVendor=RIGOL_VENDOR, idProduct=DS1000_PRODUCT, **kwargs):
+        """
+        Open every connected usbtmc device with the given vendor and product ids.
+        Devices whose serial number can't be read (usually a permissions problem,
+            see the udev rules in the README) are skipped, since they can't be
+            told apart.  Raises IOError if no scope can be opened.
+        Extra keyword arguments are passed on to rigol.Rigol.
+        """
+        if uc.usbtmc is None:
+            raise ImportError("python-usbtmc is required to discover devices.")
+        entries = [uc.deviceEntry(dev) for dev in uc.usbtmc.list_devices()
+                   if dev.idVendor == idVendor and dev.idProduct == idProduct]
+        serials = [entry["iSerial"] for entry in entries if entry["iSerial"] is not None]
+        if not entries:
+            raise IOError("No oscilloscopes found.")
+        if not serials:
+            raise IOError("Found {} oscilloscopes but couldn't read their serial numbers, "
+                          "check the usb permissions.".format(len(entries)))
+        scopes = dict((serial, rigol.Rigol("usbtmc", idProduct=idProduct, idVendor=idVendor,
+                                           iSerial=serial, **kwargs))
+                      for serial in serials)
+        return cls(scopes)
+
+    @classmethod
+    def simulated(cls, count, **kwargs):
+        """
+        <count> simulated scopes (see simcon.py) with serial numbers SIM0000000001,
+            SIM0000000002, ...  Extra keyword arguments are passed on to rigol.Rigol.
+        """
+        scopes = {}
+        for i in range(1, count + 1):
+            serial = "SIM{:010d}".format(i)
+            idn = "Rigol Technologies,DS1102E,{},00.04.02.01.00".format(serial)
+            scopes[serial] = rigol.Rigol("sim", idn=idn, seed=i, **kwargs)
+        return cls(scopes)
+
+    def map(self, func):
+        """
+        Call func(serial, scope) for every scope at the same time.
+        returns {serial: result}
+        """
+        serials = sorted(self.scopes)
+        results = self.pool.map(lambda serial: func(serial, self.scopes[serial]), serials)
+        return dict(zip(serials, results))
+
+    def captureOne(self, serial, scope, sources, dtype):
+        start = clock()
+        frame = scope.getWaveforms(sources, dtype=dtype, index=self.index)
+        stats = self.stats[serial]
+        stats["frames"] += 1
+        stats["bytes"] += sum(len(w) for w in frame.waveforms.values())
+        stats["seconds"] += clock() - start
+        return frame
+
+    def acquire(self, sources=("CHAN1", "CHAN2"), dtype=np.float64):
+        """
+        Capture <sources> from every scope at once.
+        returns a capture.FrameSet of {serial: Frame}.
+        """
+        if not self.scopes:
+            raise IOError("There are no oscilloscopes to acquire from.")
+        frames = self.map(lambda serial, scope: self.captureOne(serial, scope, sources, dtype))
+        stamps = [frame.timestamp for frame in frames.values()]
+        frameset = capture.FrameSet(self.index, sum(stamps) / len(stamps), max(stamps) - min(stamps), frames)
+        self.index += 1
+        return frameset
+
+    def iterAcquire(self, sources=("CHAN1", "CHAN2"), count=None, rate=None, dtype=np.float64):
+        """
+        Generator of FrameSets, see acquire.  Like Rigol.iterWaveforms, <count>
+            limits how many are made and <rate> how many per second.
+        """
+        start = time.time()
+        n = 0
+        while count is None or n < count:
+            if rate:
+                wait = start + n / rate - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            yield self.acquire(sources, dtype)
+            n += 1
+
+    def throughput(self):
+        """
+        {serial: {"frames_per_sec": ..., "bytes_per_sec": ...}} averaged over the
+            time each scope has spent capturing.
+        """
+        result = {}
+        for serial, stats in self.stats.items():
+            seconds = stats["seconds"] or float("nan")
+            result[serial] = {"frames_per_sec": stats["frames"] / seconds,
+                              "bytes_per_sec": stats["bytes"] / seconds}
+        return result
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
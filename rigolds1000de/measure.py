@@ -0,0 +1,162 @@
+"""
+measure.py
+
+Waveform measurements made on the computer instead of with :MEAS queries.
+    Asking the scope costs a usb round trip per measurement per channel,
+    while every measurement here comes out of one pass over the data we
+    already have, for any number of captures at once.
+
+    >>> m = measure(r.getWaveform("CHAN1"), dt=r.time_scale / 50)
+    >>> m["freq"], m["vpp"]
+
+Give a 2-D array (one capture per row) to measure many captures together, every
+    measurement is then an array with one value per capture.
+
+Top and base are the means of the samples above and below the middle of the
+    range, which is what they are for a square wave.  An edge only counts once
+    the signal has crossed both the 10% and 90% levels, so noise doesn't add
+    edges, and rise and fall times are measured edge by edge between those
+    levels.  Period, frequency and the duty cycles are nan when there aren't
+    two rising edges.
+"""
+from __future__ import division
+import numpy as np
+
+
+MEASUREMENTS = ["vmax", "vmin", "vpp", "vtop", "vbase", "vamp", "vavg", "vrms",
+                "overshoot", "preshoot", "freq", "period", "rise", "fall",
+                "pwidth", "nwidth", "pduty", "nduty"]
+
+
+def measure(data, dt=1.0):
+    """
+    data - waveform voltages, e.g. from Rigol.getWaveform, or a 2-D array of them.
+    dt - seconds between samples.  For a normal 600 point capture it is
+        Rigol.time_scale / 50.
+    returns {name: value} for every name in MEASUREMENTS.  Times are in seconds,
+        overshoot, preshoot and the duty cycles are fractions.
+    """
+    data = np.asarray(data, np.float64)
+    single = data.ndim == 1
+    data = np.atleast_2d(data)
+    rows, n = data.shape
+    if n < 2:
+        raise ValueError("Need at least 2 points to measure a waveform.")
+    result = {}
+    vmax = data.max(axis=1)
+    vmin = data.min(axis=1)
+    result["vmax"] = vmax
+    result["vmin"] = vmin
+    result["vpp"] = vmax - vmin
+    result["vavg"] = data.mean(axis=1)
+    result["vrms"] = np.sqrt(np.einsum("ij,ij->i", data, data) / n)
+
+    mid = (vmax + vmin)[:, None] / 2
+    above = data > mid
+    n_above = above.sum(axis=1)
+    total = data.sum(axis=1)
+    sum_above = np.where(above, data, 0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        top = np.where(n_above > 0, sum_above / n_above, vmax)
+        base = np.where(n_above < n, (total - sum_above) / (n - n_above), vmin)
+        amp = top - base
+        result["vtop"] = top
+        result["vbase"] = base
+        result["vamp"] = amp
+        result["overshoot"] = (vmax - top) / amp
+        result["preshoot"] = (base - vmin) / amp
+
+    # an edge is counted once the signal has gone all the way from one of the
+    #     10% and 90% levels to the other, so noise around either can't add edges
+    low = base + .1 * amp
+    high = base + .9 * amp
+    state, held = hysteresis(data, low[:, None], high[:, None])
+    rise_row, rise_time, rise_length = edges(data, state, held, 0, low, high)
+    fall_row, fall_time, fall_length = edges(data, state, held, 1, high, low)
+    n_rising = np.bincount(rise_row, minlength=rows)
+    n_falling = np.bincount(fall_row, minlength=rows)
+    first = np.full(rows, np.inf)
+    last = np.full(rows, -np.inf)
+    np.minimum.at(first, rise_row, rise_time)
+    np.maximum.at(last, rise_row, rise_time)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        period = np.where(n_rising >= 2, (last - first) / np.maximum(n_rising - 1, 1), np.nan) * dt
+        result["rise"] = np.bincount(rise_row, rise_length, rows) / n_rising * dt
+        result["fall"] = np.bincount(fall_row, fall_length, rows) / n_falling * dt
+    result["period"] = period
+    with np.errstate(divide="ignore"):
+        result["freq"] = 1 / period
+
+    # rising and falling edges alternate, so the time from each edge to the next
+    #     one on the same row is a positive or a negative pulse
+    row = np.concatenate([rise_row, fall_row])
+    when = np.concatenate([rise_time, fall_time])
+    rising = np.concatenate([np.ones(len(rise_row), bool), np.zeros(len(fall_row), bool)])
+    order = np.lexsort((when, row))
+    row, when, rising = row[order], when[order], rising[order]
+    pulse = row[1:] == row[:-1]
+    width = (when[1:] - when[:-1])[pulse]
+    positive = rising[:-1][pulse]
+    pulse_row = row[1:][pulse]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pwidth = np.bincount(pulse_row[positive], width[positive], rows) / np.bincount(pulse_row[positive], minlength=rows) * dt
+        nwidth = np.bincount(pulse_row[~positive], width[~positive], rows) / np.bincount(pulse_row[~positive], minlength=rows) * dt
+        result["pwidth"] = pwidth
+        result["nwidth"] = nwidth
+        result["pduty"] = pwidth / period
+        result["nduty"] = nwidth / period
+
+    if single:
+        return dict((name, float(value[0])) for name, value in result.items())
+    return result
+
+
+def hysteresis(data, low, high):
+    """
+    The state of each sample, 1 if the signal last touched <high>, 0 if it last
+        touched <low> and -1 before it touched either.
+    returns (state, index of the sample that set each state)
+    """
+    mark = np.full(data.shape, -1, np.int8)
+    mark[data <= low] = 0
+    mark[data >= high] = 1
+    held = np.where(mark >= 0, np.arange(data.shape[1]), 0)
+    np.maximum.accumulate(held, axis=1, out=held)
+    return mark[np.arange(len(data))[:, None], held], held
+
+
+def edges(data, state, held, before, start_level, end_level):
+    """
+    Edges leaving state <before>, from the last sample at <start_level> to the
+        first at <end_level>, both interpolated between samples.
+    returns (row, time at the middle of the edge, length) of every edge, in samples.
+    """
+    row, end = np.nonzero((state[:, :-1] == before) & (state[:, 1:] == 1 - before))
+    start = held[row, end]
+    t_start = start + crossing(data[row, start], data[row, start + 1], start_level[row])
+    t_end = end + crossing(data[row, end], data[row, end + 1], end_level[row])
+    return row, (t_start + t_end) / 2, t_end - t_start
+
+
+def crossing(before, after, level):
+    """
+    Fraction of a sample after <before> at which the line to <after> crosses <level>.
+    """
+    return (level - before) / (after - before)
+
+
+def measureFrame(frame, dt=1.0):
+    """
+    Measure every waveform in a capture.Frame.
+    returns {source: {name: value}}
+    """
+    return dict((source, measure(waveform, dt)) for source, waveform in frame.waveforms.items())
+
+
+def measureFrames(frames, source, dt=1.0):
+    """
+    Measure <source> in many capture.Frame's at once.  The waveforms must all
+        be the same length.
+    returns {name: array with a value per frame}
+    """
+    return measure(np.vstack([frame.waveforms[source] for frame in frames]), dt)
@@ -12,9 +12,22 @@ sources I used
 - http://www.cibomahto.com/2010/04/controlling-a-rigol-oscilloscope-using-linux-and-python/
 """
 from __future__ import division
+from contextlib import contextmanager
 import usbcon as uc
+import simcon as sc
+import settingscache
+import ioworker
+import capture
+import decimate
+import timeaxis
 import numpy as np
 import ast
+import threading
+import time
+try:
+    import Queue as queue  # python2
+except:
+    import queue  # python3
 try:
     import tkFileDialog as tkfd  # python2
 except:
@@ -33,27 +46,55 @@ class InvalidArgument(Exception):
 
 class Rigol:
 
-    backends = ["usbtmc"]
+    backends = ["usbtmc", "sim"]
 
-    def __init__(self, backend, idProduct=None, idVendor=None):
+    def __init__(self, backend, idProduct=None, idVendor=None, cache=False, threaded=False, **kwargs):
         """
         The volt1/2_scale attributes, along with other attributes defined here
             should always be up to date if you are changing them solely with the methods
             of this class.  If you change the voltage scale on the oscilloscope manually,
             you have to update these attributes manually also, or just use the "ask" methods
             to query the volt scale/offset or time scale/offset.
-        """
+        backend "sim" talks to a simulated scope (see simcon.py) instead of real hardware.
+            Any extra keyword arguments, such as latency and bandwidth, are passed on to it.
+        The attributes are asked for the first time one of them is used rather than
+            when connecting, so that connecting costs as few round trips as possible.
+            The seconds spent connecting are kept in connect_times.
+        cache -> if True, settings that are already known are not asked for again over
+            usb (see settingscache.py).  Call invalidateCache or refreshAttributes after
+            changing settings on the front panel.
+        threaded -> if True, a single thread does all of the usb I/O and setters go
+            ahead of queued waveform reads (see ioworker.py).
+        """
+        start = time.time()
         if backend == "usbtmc":
-            self.dev = uc.UsbCon(idProduct=idProduct, idVendor=idVendor)
+            self.dev = uc.UsbCon(idProduct=idProduct, idVendor=idVendor, **kwargs)
+        elif backend == "sim":
+            self.dev = sc.SimCon(**kwargs)
         else:
             raise InvalidBackendException("Please specify a valid backend such as {}".format(self.backends))
-        delay = True if self.askTimebaseMode() == "DEL" else False
-        self.volt1_scale = self.askChannelScale(1)
-        self.volt1_offset = self.askChannelOffset(1)
-        self.volt2_scale = self.askChannelScale(2)
-        self.volt2_offset = self.askChannelOffset(2)
-        self.time_scale = self.askTimebaseScale(delayed=delay)
-        self.time_offset = self.askTimebaseOffset(delayed=delay)
+        if threaded:
+            self.dev = ioworker.WorkerCon(self.dev)
+        if cache:
+            self.dev = settingscache.SettingsCache(self.dev)
+        self.waveform_buffers = {}
+        self.time_axes = {}
+        self.connect_times = dict(getattr(self.dev, "connect_times", {}))
+        self.connect_times["total"] = time.time() - start
+
+    # settings attributes that are asked for on first use, see refreshAttributes
+    lazy_attributes = ("volt1_scale", "volt1_offset", "volt2_scale", "volt2_offset",
+                       "time_scale", "time_offset")
+
+    def __getattr__(self, name):
+        """
+        Only called for attributes that haven't been set yet.  The first time one
+            of the settings attributes is used, they are all asked for together.
+        """
+        if name in Rigol.lazy_attributes:
+            self.refreshAttributes()
+            return self.__dict__[name]
+        raise AttributeError(name)
 
     def identify(self):
         return self.dev.ask("*IDN?")
@@ -84,13 +125,69 @@ class Rigol:
         In case settings are changed manually on the oscilloscope, we can reset all
             of our class attributes with this method.
         """
-        delay = True if self.askTimebaseMode() == "DEL" else False
-        self.volt1_scale = self.askChannelScale(1)
-        self.volt1_offset = self.askChannelOffset(1)
-        self.volt2_scale = self.askChannelScale(2)
-        self.volt2_offset = self.askChannelOffset(2)
-        self.time_scale = self.askTimebaseScale(delayed=delay)
-        self.time_offset = self.askTimebaseOffset(delayed=delay)
+        self.invalidateCache()
+        self.time_axes.clear()
+        queries = [":TIM:MODE?", ":CHAN1:SCAL?", ":CHAN1:OFFS?", ":CHAN2:SCAL?", ":CHAN2:OFFS?"]
+        both = [":TIM:SCAL?", ":TIM:OFFS?", ":TIM:DEL:SCAL?", ":TIM:DEL:OFFS?"]
+        # if everything fits in one compound query, asking for both timebases
+        #     up front is free.  Otherwise the timebase in use is asked for once
+        #     the mode is known, which is 7 queries instead of 9.
+        together = len(queries) + len(both) <= getattr(self.dev, "max_compound", 1)
+        r = self.askBatch(queries + both if together else queries)
+        delay = ":DEL" if r[":TIM:MODE?"].startswith("DEL") else ""
+        if not together:
+            r.update(self.askBatch([":TIM{}:SCAL?".format(delay), ":TIM{}:OFFS?".format(delay)]))
+        self.volt1_scale = r[":CHAN1:SCAL?"]
+        self.volt1_offset = r[":CHAN1:OFFS?"]
+        self.volt2_scale = r[":CHAN2:SCAL?"]
+        self.volt2_offset = r[":CHAN2:OFFS?"]
+        self.time_scale = r[":TIM{}:SCAL?".format(delay)]
+        self.time_offset = r[":TIM{}:OFFS?".format(delay)]
+
+    def askBatch(self, queries):
+        """
+        Asks every query in <queries> while holding the connection for the
+            whole batch, packing them into as few usb transactions as the
+            backend allows.
+        returns a dictionary of {query: response}.  Responses that are numbers
+            are converted to floats, the rest are left as strings.
+        """
+        queries = list(queries)
+        responses = self.dev.ask_many(queries)
+        return dict((q, self.parseResponse(r)) for q, r in zip(queries, responses))
+
+    def parseResponse(self, response):
+        """
+        "1.000e+00" -> 1.0, anything that isn't a number is returned unchanged.
+        """
+        try:
+            return float(response)
+        except ValueError:
+            return response
+
+    def askState(self):
+        """
+        A snapshot of the acquire, display, timebase, trigger and channel
+            settings, fetched with a single askBatch.
+        """
+        queries = [":ACQ:TYPE?", ":ACQ:MODE?", ":ACQ:AVER?", ":ACQ:MEMD?",
+                   ":DISP:TYPE?", ":DISP:GRID?", ":DISP:PERS?", ":DISP:BRIG?", ":DISP:INT?",
+                   ":TIM:MODE?", ":TIM:OFFS?", ":TIM:SCAL?", ":TIM:DEL:OFFS?", ":TIM:DEL:SCAL?",
+                   ":TIM:FORM?", ":TRIG:MODE?", ":TRIG:HOLD?", ":WAV:POIN:MODE?"]
+        for channel in [1, 2]:
+            queries += [q.format(channel) for q in [":CHAN{}:BWL?", ":CHAN{}:COUP?", ":CHAN{}:DISP?",
+                                                   ":CHAN{}:INV?", ":CHAN{}:OFFS?", ":CHAN{}:PROB?",
+                                                   ":CHAN{}:SCAL?", ":CHAN{}:FILT?", ":CHAN{}:VERN?"]]
+        return self.askBatch(queries)
+
+    def invalidateCache(self, query=None):
+        """
+        Forget cached setting values so the next ask goes to the oscilloscope.
+        query - a single query such as ":CHAN1:SCAL?", or None for everything.
+        Does nothing if the cache is not enabled.
+        """
+        if isinstance(self.dev, settingscache.SettingsCache):
+            self.dev.invalidate(query)
 
     ###########
     # ACQUIRE #
@@ -1263,25 +1360,292 @@ class Rigol:
     # MEASURE #
     ###########
     """
-    partially implemented
-    1 - no
-    2 - yes
-    3 - no
-    .
-    .
-    .
-    23 - yes
+    implemented
+    1 - 23 yes
+    The phase queries (PPHase/NPHase) are only answered by newer firmware, and
+        time out on the rest, so measureAll leaves them out.
+    Queries the scope can't answer ("****", or 9.9E37 when the signal is out of
+        range) are returned as nan.  For measurements that don't cost a usb
+        round trip each, see measure.py.
     """
+    # (key in measureAll, short form of the :MEAS query)
+    measurements = [
+        ("vpp", "VPP"),
+        ("vmax", "VMAX"),
+        ("vmin", "VMIN"),
+        ("vamp", "VAMP"),
+        ("vtop", "VTOP"),
+        ("vbase", "VBAS"),
+        ("vavg", "VAV"),
+        ("vrms", "VRMS"),
+        ("overshoot", "OVER"),
+        ("preshoot", "PRES"),
+        ("freq", "FREQ"),
+        ("rise", "RIS"),
+        ("fall", "FALL"),
+        ("period", "PER"),
+        ("pwidth", "PWID"),
+        ("nwidth", "NWID"),
+        ("pduty", "PDUT"),
+        ("nduty", "NDUT"),
+        ("pdelay", "PDEL"),
+        ("ndelay", "NDEL"),
+    ]
+
+    # MEASURE 1
+    def measureClear(self):
+        """
+        Clears all measurements off the screen.
+        """
+        self.dev.write(":MEAS:CLE")
+
+    def parseMeasurement(self, response):
+        """
+        "1.000e+03" -> 1000.0, and anything that isn't a valid measurement -> nan.
+        """
+        try:
+            value = float(response)
+        except ValueError:
+            return float("nan")
+        if abs(value) >= 9.9e37:
+            return float("nan")
+        return value
+
+    def askMeasurement(self, item, channel):
+        """
+        item - short form of the :MEAS query, e.g. "VPP".
+        channel is either 1 or 2
+        """
+        if channel not in [1, 2]:
+            raise InvalidArgument("Channel argument must be either 1 or 2")
+        msg = ":MEAS:{}? CHAN{}".format(item, channel)
+        return self.parseMeasurement(self.dev.ask(msg))
 
+    # MEASURE 2
     def measureVpp(self, channel):
         """
         channel is either 1 or 2
         returns peak to peak voltage in Volts.
         """
+        return self.askMeasurement("VPP", channel)
+
+    # MEASURE 3
+    def measureVmax(self, channel):
+        """
+        channel is either 1 or 2
+        returns maximum voltage in Volts.
+        """
+        return self.askMeasurement("VMAX", channel)
+
+    # MEASURE 4
+    def measureVmin(self, channel):
+        """
+        channel is either 1 or 2
+        returns minimum voltage in Volts.
+        """
+        return self.askMeasurement("VMIN", channel)
+
+    # MEASURE 5
+    def measureVamplitude(self, channel):
+        """
+        channel is either 1 or 2
+        returns top minus base voltage in Volts.
+        """
+        return self.askMeasurement("VAMP", channel)
+
+    # MEASURE 6
+    def measureVtop(self, channel):
+        """
+        channel is either 1 or 2
+        returns flat top voltage in Volts.
+        """
+        return self.askMeasurement("VTOP", channel)
+
+    # MEASURE 7
+    def measureVbase(self, channel):
+        """
+        channel is either 1 or 2
+        returns flat base voltage in Volts.
+        """
+        return self.askMeasurement("VBAS", channel)
+
+    # MEASURE 8
+    def measureVaverage(self, channel):
+        """
+        channel is either 1 or 2
+        returns average voltage in Volts.
+        """
+        return self.askMeasurement("VAV", channel)
+
+    # MEASURE 9
+    def measureVrms(self, channel):
+        """
+        channel is either 1 or 2
+        returns rms voltage in Volts.
+        """
+        return self.askMeasurement("VRMS", channel)
+
+    # MEASURE 10
+    def measureOvershoot(self, channel):
+        """
+        channel is either 1 or 2
+        returns overshoot, as reported by the scope.
+        """
+        return self.askMeasurement("OVER", channel)
+
+    # MEASURE 11
+    def measurePreshoot(self, channel):
+        """
+        channel is either 1 or 2
+        returns preshoot, as reported by the scope.
+        """
+        return self.askMeasurement("PRES", channel)
+
+    # MEASURE 12
+    def measureFrequency(self, channel):
+        """
+        channel is either 1 or 2
+        returns frequency in Hz.
+        """
+        return self.askMeasurement("FREQ", channel)
+
+    # MEASURE 13
+    def measureRiseTime(self, channel):
+        """
+        channel is either 1 or 2
+        returns 10% to 90% rise time in seconds.
+        """
+        return self.askMeasurement("RIS", channel)
+
+    # MEASURE 14
+    def measureFallTime(self, channel):
+        """
+        channel is either 1 or 2
+        returns 90% to 10% fall time in seconds.
+        """
+        return self.askMeasurement("FALL", channel)
+
+    # MEASURE 15
+    def measurePeriod(self, channel):
+        """
+        channel is either 1 or 2
+        returns period in seconds.
+        """
+        return self.askMeasurement("PER", channel)
+
+    # MEASURE 16
+    def measurePositiveWidth(self, channel):
+        """
+        channel is either 1 or 2
+        returns positive pulse width in seconds.
+        """
+        return self.askMeasurement("PWID", channel)
+
+    # MEASURE 17
+    def measureNegativeWidth(self, channel):
+        """
+        channel is either 1 or 2
+        returns negative pulse width in seconds.
+        """
+        return self.askMeasurement("NWID", channel)
+
+    # MEASURE 18
+    def measurePositiveDuty(self, channel):
+        """
+        channel is either 1 or 2
+        returns positive duty cycle.
+        """
+        return self.askMeasurement("PDUT", channel)
+
+    # MEASURE 19
+    def measureNegativeDuty(self, channel):
+        """
+        channel is either 1 or 2
+        returns negative duty cycle.
+        """
+        return self.askMeasurement("NDUT", channel)
+
+    # MEASURE 20
+    def measurePositiveDelay(self, channel):
+        """
+        channel is either 1 or 2
+        returns delay between the rising edges of CH1 and CH2 in seconds.
+        """
+        return self.askMeasurement("PDEL", channel)
+
+    # MEASURE 21
+    def measureNegativeDelay(self, channel):
+        """
+        channel is either 1 or 2
+        returns delay between the falling edges of CH1 and CH2 in seconds.
+        """
+        return self.askMeasurement("NDEL", channel)
+
+    # MEASURE, newer firmware
+    def measurePositivePhase(self, channel):
+        """
+        channel is either 1 or 2
+        returns phase between the rising edges of CH1 and CH2 in degrees.
+        """
+        return self.askMeasurement("PPH", channel)
+
+    # MEASURE, newer firmware
+    def measureNegativePhase(self, channel):
+        """
+        channel is either 1 or 2
+        returns phase between the falling edges of CH1 and CH2 in degrees.
+        """
+        return self.askMeasurement("NPH", channel)
+
+    # MEASURE 22
+    def measureTotal(self, on=True):
+        """
+        Turns the display of all measurements on or off.
+        """
+        msg = ":MEAS:TOT {}".format("ON" if on else "OFF")
+        self.dev.write(msg)
+
+    def askMeasureTotal(self):
+        """
+        The query returns ON or OFF.
+        """
+        msg = ":MEAS:TOT?"
+        return self.dev.ask(msg)
+
+    # MEASURE 23
+    def measureSource(self, channel):
+        """
+        channel is either 1 or 2
+        Sets the source of the measurements shown on screen.
+        """
         if channel not in [1, 2]:
             raise InvalidArgument("Channel argument must be either 1 or 2")
-        msg = ":MEAS:VPP? CHAN{}".format(channel)
-        return float(self.dev.ask(msg))
+        msg = ":MEAS:SOUR CHAN{}".format(channel)
+        self.dev.write(msg)
+
+    def askMeasureSource(self):
+        """
+        The query returns CH1 or CH2.
+        """
+        msg = ":MEAS:SOUR?"
+        return self.dev.ask(msg)
+
+    ######################
+    # CUSTOM MEASUREMENT #
+    ######################
+    def measureAll(self, channel):
+        """
+        Every :MEAS query for <channel> (1 or 2), asked while holding the
+            connection and packed into as few usb transactions as the backend
+            allows.
+        returns {key: float} for every key in Rigol.measurements, nan where the
+            scope couldn't make the measurement.
+        """
+        if channel not in [1, 2]:
+            raise InvalidArgument("Channel argument must be either 1 or 2")
+        queries = [":MEAS:{}? CHAN{}".format(item, channel) for _, item in self.measurements]
+        responses = self.dev.ask_many(queries)
+        return dict((key, self.parseMeasurement(r)) for (key, _), r in zip(self.measurements, responses))
 
     ############
     # WAVEFORM #
@@ -1297,6 +1661,31 @@ class Rigol:
         returns 1024 data for <source>.  Raw Data.
         run through numpy.frombuffer(data, "B") to get point data
         First 10 bytes are apparently a header, so we can skip those.
+        For long memory captures use askWaveformBlock instead.
+        The data is a memoryview of the response rather than a slice so that
+            the payload isn't copied.
+        """
+        return memoryview(self.askWaveformRaw(source))[10:]
+
+    def askWaveformBlock(self, source, out=None, done=None):
+        """
+        Reads the waveform data for <source>, using the length in the block
+            header to find the data.  Meant for long memory (up to 1Mpts)
+            captures, which take a while to come over usb.
+        out - optional uint8 array to copy into.
+        done - optional function called as done(total_bytes) once the data has
+            been read, see UsbCon.ask_block.
+        returns a uint8 numpy array of raw data.
+        """
+        valid_sources = ["CHAN1", "CHAN2", "DIG", "MATH", "FFT"]
+        if source not in valid_sources:
+            raise InvalidArgument("Source argument must be one of {}".format(valid_sources))
+        msg = ":WAV:DATA? {}".format(source)
+        return self.dev.ask_block(msg, out=out, done=done)
+
+    def askWaveformRaw(self, source):
+        """
+        Like askWaveformData, but the response is returned whole, header included.
         """
         valid_sources = ["CHAN1", "CHAN2", "DIG", "MATH", "FFT"]
         if source not in valid_sources:
@@ -1305,7 +1694,7 @@ class Rigol:
         # self.dev.read()
         # self.dev.write(msg)
         # return self.dev.read_raw()
-        return self.dev.ask_raw(msg)[10:]
+        return self.dev.ask_raw(msg)
 
     # WAVEFORM 2
     def waveformPointsMode(self, mode):
@@ -1329,37 +1718,257 @@ class Rigol:
     ###################
     # CUSTOM WAVEFORM #
     ###################
-    def getWaveform(self, source):
+    def getWaveform(self, source, out=None, dtype=np.float64, pooled=False):
         """
         The data that is extracted from the oscilloscope needs to be inverted,
             multiplied by a constant and shifted by some voltage offset to get the
             true values.
         A custom method for retrieving the corrected voltage values out of the
             oscilloscope.
+        out, dtype and pooled are passed on to convertVoltages.
         """
-        raw_data = self.askWaveformData(source)
-        raw_data = np.frombuffer(raw_data, "B")
-        data = self.convertVoltages(raw_data, source)
+        raw_data = np.frombuffer(self.askWaveformRaw(source), "B", offset=10)
+        data = self.convertVoltages(raw_data, source, out=out, dtype=dtype, pooled=pooled)
         return data
 
-    def convertVoltages(self, data, source):
+    def getWaveforms(self, sources=("CHAN1", "CHAN2"), dtype=np.float64, index=0):
         """
-        data - numpy array of unconverted voltage values.
+        Reads every source in <sources> back to back, holding the connection so
+            that nothing else gets between the reads.
+        returns a capture.Frame with a single timestamp for all of them.
+        """
+        self.dev.lock.acquire()
+        try:
+            timestamp = time.time()
+            waveforms = dict((source, self.getWaveform(source, dtype=dtype)) for source in sources)
+        finally:
+            self.dev.lock.release()
+        return capture.Frame(index, timestamp, waveforms)
+
+    def getWaveformLong(self, source, done=None, dtype=np.float64):
+        """
+        Stops the oscilloscope and reads the full record in memory for <source>.
+        Turn on long memory with acquireMemDepth("LONG") and let the scope make an
+            acquisition beforehand to get up to 1Mpts.  The scope is left stopped,
+            use run() to start it again.  The waveform points mode is put back
+            the way it was.
+        done is passed on to askWaveformBlock.
+        """
+        self.stop()
+        with self.rawPointsMode():
+            raw_data = self.askWaveformBlock(source, done=done)
+        return self.convertVoltages(raw_data, source, dtype=dtype)
+
+    @contextmanager
+    def rawPointsMode(self):
+        """
+        Switch to RAW waveform points for a with block, and back to the mode it
+            was in afterwards.
+        """
+        # asked for in the long form, e.g. NORMAL, but set with the short one
+        mode = self.askWaveformPointsMode()
+        previous = {"NORMAL": "NORM", "MAXIMUM": "MAX"}.get(mode, mode)
+        self.waveformPointsMode("RAW")
+        try:
+            yield
+        finally:
+            if previous != "RAW":
+                self.waveformPointsMode(previous)
+
+    def settingsSnapshot(self, source, sampling_rate=float("nan")):
+        """
+        The settings a capture of <source> is being taken with, as a capture.Settings.
         """
         if source == "CHAN1":
-            data = -data + 255
-            data = (data - 130.0 - self.volt1_offset/self.volt1_scale*25) / 25 * self.volt1_scale
+            scale, offset = self.volt1_scale, self.volt1_offset
         elif source == "CHAN2":
-            data = -data + 255
-            data = (data - 130.0 - self.volt2_offset/self.volt2_scale*25) / 25 * self.volt2_scale
-        return data
+            scale, offset = self.volt2_scale, self.volt2_offset
+        else:
+            scale, offset = 0.0, 0.0
+        return capture.Settings(scale, offset, self.time_scale, self.time_offset, sampling_rate)
+
+    def getCapture(self, source):
+        """
+        Like getWaveform, but nothing is converted.  The raw data is kept along
+            with the settings, and converted only when its volts are asked for.
+        returns a capture.Capture.
+        """
+        timestamp = time.time()
+        raw = np.frombuffer(self.askWaveformRaw(source), "B", offset=10)
+        return capture.Capture(raw, source, timestamp, self.settingsSnapshot(source))
+
+    def getCaptures(self, sources=("CHAN1", "CHAN2"), index=0):
+        """
+        getCapture of every source in <sources>, read back to back like getWaveforms.
+        returns a capture.Frame of {source: capture.Capture}.
+        """
+        self.dev.lock.acquire()
+        try:
+            timestamp = time.time()
+            captures = dict((source, self.getCapture(source)) for source in sources)
+        finally:
+            self.dev.lock.release()
+        return capture.Frame(index, timestamp, captures)
+
+    def getCaptureLong(self, source, done=None):
+        """
+        Like getWaveformLong, but returns a capture.Capture.  The sampling rate is
+            asked for as well so that the capture's time axis is right.
+        """
+        self.stop()
+        rate = float(self.askAcquireSamplingRate(int(source[-1]) if source.startswith("CHAN") else 1))
+        timestamp = time.time()
+        with self.rawPointsMode():
+            raw = self.askWaveformBlock(source, done=done)
+        return capture.Capture(raw, source, timestamp, self.settingsSnapshot(source, rate))
+
+    def iterWaveforms(self, sources=("CHAN1", "CHAN2"), count=None, rate=None, prefetch=0, dtype=np.float64):
+        """
+        Generator of capture.Frame's, each holding one getWaveform of every source.
+        Captures are only made as they are consumed, so memory use stays bounded
+            no matter how long the stream runs.
+        count - stop after this many frames, or never if None.
+        rate - at most this many frames per second, or as fast as possible if None.
+        prefetch - if > 0, capture in a background thread up to <prefetch> frames
+            ahead of the consumer.  The thread waits whenever that many frames
+            are waiting to be consumed.
+        """
+        frames = self.captureFrames(sources, count, rate, dtype)
+        if not prefetch:
+            for frame in frames:
+                yield frame
+            return
+        q = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # gives up once the consumer has gone, rather than waiting on a full queue forever
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def producer():
+            try:
+                for frame in frames:
+                    if not put(frame):
+                        return
+                put(done)
+            except Exception as e:
+                put(e)
+
+        t = threading.Thread(target=producer)
+        t.daemon = True
+        t.start()
+        try:
+            while True:
+                frame = q.get()
+                if frame is done:
+                    return
+                if isinstance(frame, Exception):
+                    raise frame
+                yield frame
+        finally:
+            stop.set()
+
+    def captureFrames(self, sources, count=None, rate=None, dtype=np.float64):
+        """
+        The capture loop behind iterWaveforms.
+        """
+        start = time.time()
+        index = 0
+        while count is None or index < count:
+            if rate:
+                wait = start + index / rate - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            yield self.getWaveforms(sources, dtype=dtype, index=index)
+            index += 1
+
+    def getThumbnail(self, source, width=200):
+        """
+        A small version of the waveform on <source> for previews, reduced to
+            the min and max of <width> bins so that peaks aren't lost.
+        returns an array of about 2 * <width> voltages.
+        """
+        return decimate.decimate(self.getWaveform(source), width)
+
+    def voltageAffine(self, source):
+        """
+        The conversion from raw data to voltages, folded into a single
+            volts = gain * data + bias
+        returns (gain, bias) for "CHAN1" or "CHAN2".
+        """
+        if source == "CHAN1":
+            scale, offset = self.volt1_scale, self.volt1_offset
+        elif source == "CHAN2":
+            scale, offset = self.volt2_scale, self.volt2_offset
+        else:
+            raise InvalidArgument("Source argument must be one of {}".format(["CHAN1", "CHAN2"]))
+        # ((255 - data) - 130 - offset/scale*25) / 25 * scale
+        return capture.voltageAffine(scale, offset)
 
-    def getTimebase(self):
+    def waveformBuffer(self, source, length, dtype=np.float64):
         """
-        get correct x-values for plotting waveform
+        A reusable output array for convertVoltages, one per source and dtype.
+        The same memory is handed out every time, so its contents are only good
+            until the next conversion of that source.
         """
-        time_axis = np.arange(-300.0/50*self.time_scale, 300.0/50*self.time_scale, self.time_scale/50.0)
-        return time_axis
+        key = (source, np.dtype(dtype))
+        buf = self.waveform_buffers.get(key)
+        if buf is None or len(buf) < length:
+            buf = self.waveform_buffers[key] = np.empty(length, dtype)
+        return buf[:length]
+
+    def convertVoltages(self, data, source, out=None, dtype=np.float64, pooled=False):
+        """
+        data - numpy array of unconverted voltage values.
+        out - optional array to write the voltages into.  It must be as long as data.
+        dtype - dtype of the returned array when out isn't given, e.g. numpy.float32
+            to halve the memory of long captures.
+        pooled - if True (and out isn't given), write into waveformBuffer instead of a
+            new array.
+        The conversion is a multiply and an add in the output's own dtype, which
+            measured faster than looking the bytes up in a 256 entry table at
+            every record length, into new and reused arrays alike.
+        Only CHAN1 and CHAN2 data are converted, anything else is returned as is.
+        """
+        if source not in ["CHAN1", "CHAN2"]:
+            return data
+        if out is None:
+            out = self.waveformBuffer(source, len(data), dtype) if pooled else np.empty(len(data), dtype)
+        # python floats would make numpy do float32 outputs in float64 and cast back
+        gain, bias = self.voltageAffine(source)
+        scalar = out.dtype.type
+        np.multiply(data, scalar(gain), out=out, casting="unsafe")
+        out += scalar(bias)
+        return out
+
+    def getTimebase(self, length=timeaxis.SCREEN_POINTS):
+        """
+        get correct x-values for plotting waveform
+        length - number of points in the waveform.  Anything other than a normal
+            600 point record is taken to be a full memory record (MAX or RAW),
+            whose spacing comes from the sampling rate.
+        returns a timeaxis.TimeAxis, which works like an array of times but is
+            only made into one when needed.  Axes are kept for each timebase
+            setting and length, so asking again costs nothing.
+        """
+        mode = "NORM" if length == timeaxis.SCREEN_POINTS else "RAW"
+        key = (self.time_scale, self.time_offset, length, mode)
+        axis = self.time_axes.get(key)
+        if axis is None:
+            if mode == "NORM":
+                axis = timeaxis.screenAxis(self.time_scale, self.time_offset)
+            else:
+                rate = float(self.askAcquireSamplingRate(1))
+                axis = timeaxis.centeredAxis(1 / rate, self.time_offset, length)
+            self.time_axes[key] = axis
+        return axis
 
     #######
     # KEY #
@@ -1397,33 +2006,23 @@ class Rigol:
             formatted file to a location of your choosing through tkFileDialog.
         """
         save_location = tkfd.asksaveasfilename(defaultextension=".ros", filetypes=[("Rigol Oscilloscope Save", "*.ros")])
+        state = self.askState()
         s = []
-        acquire_type = self.askAcquireType()[:4]
-        s.append(":ACQ:TYPE {}".format(acquire_type))
-        aquire_mode = self.askAquireMode()
-        aquire_mode = "RTIM" if aquire_mode[0] == "R" else "ETIM"
+        s.append(":ACQ:TYPE {}".format(state[":ACQ:TYPE?"][:4]))
+        aquire_mode = "RTIM" if state[":ACQ:MODE?"][0] == "R" else "ETIM"
         s.append(":ACQ:MODE {}".format(aquire_mode))
-        memdepth = self.askAcquireMemDepth()[:4]
-        s.append(":ACQ:MEMD {}".format(memdepth))
-        disptype = self.askDisplayType()[:4]
-        s.append(":DISP:TYPE {}".format(disptype))
-        dispgrid = self.askDisplayGrid()
-        s.append(":DISP:GRID {}".format(dispgrid))
-        disppersisty = self.askDisplayPersist()
-        s.append(":DISP:PERS {}".format(disppersisty))
-        dispbrightness = self.askDisplayBrightness()
-        s.append(":DISP:BRIG {}".format(dispbrightness))
-        dispintensity = self.askDisplayIntensity()
-        s.append(":DISP:INT {}".format(dispintensity))
-        timemode = self.askTimebaseMode()
-        timemode = "DEL" if timemode == "DELAYED" else timemode
+        s.append(":ACQ:MEMD {}".format(state[":ACQ:MEMD?"][:4]))
+        s.append(":DISP:TYPE {}".format(state[":DISP:TYPE?"][:4]))
+        s.append(":DISP:GRID {}".format(state[":DISP:GRID?"]))
+        s.append(":DISP:PERS {}".format(state[":DISP:PERS?"]))
+        s.append(":DISP:BRIG {}".format(int(state[":DISP:BRIG?"])))
+        s.append(":DISP:INT {}".format(int(state[":DISP:INT?"])))
+        timemode = "DEL" if state[":TIM:MODE?"] == "DELAYED" else state[":TIM:MODE?"]
         s.append(":TIM:MODE {}".format(timemode))
-        delayed = True if timemode == "DEL" else False
-        timeoffset = self.askTimebaseMode(delayed=delayed)
-        s.append(":TIM{}:OFFS {}".format(":DEL" if delayed else "", timeoffset))
-        timescale = self.askTimebaseScale(delayed=delayed)
-        s.append(":TIM{}:SCAL {}".format(":DEL" if delayed else "", timescale))
-        timeformat = self.askTimebaseFormat()
+        delayed = ":DEL" if timemode == "DEL" else ""
+        s.append(":TIM{}:OFFS {}".format(delayed, state[":TIM{}:OFFS?".format(delayed)]))
+        s.append(":TIM{}:SCAL {}".format(delayed, state[":TIM{}:SCAL?".format(delayed)]))
+        timeformat = {"X-Y": "XY", "Y-T": "YT", "SCANNING": "SCAN"}.get(state[":TIM:FORM?"], state[":TIM:FORM?"])
         s.append(":TIM:FORM {}".format(timeformat))
         #  continue with trigger settings
 
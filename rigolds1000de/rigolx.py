@@ -9,9 +9,11 @@ multiprocessing based off of the answer to this post
     - http://stackoverflow.com/questions/13228763/using-multiprocessing-module-for-updating-tkinter-gui
 """
 from __future__ import division
-from multiprocessing import Process, Queue, RLock
-from Queue import Empty
+from multiprocessing import Process, RLock
 import rigol
+import ringbuffer
+import decimate
+import scheduler
 try:
     import Tkinter as tk  # python2
 except:
@@ -27,15 +29,17 @@ __author__ = "Brian Perrett"
 
 class Rigolx:
 
-    def __init__(self, rigol_backend="usbtmc", checkqueuedelay=.09, addqueuetime=.2):
+    def __init__(self, rigol_backend="usbtmc", checkqueuedelay=.09, addqueuetime=.1):
         """
         checkqueuedelay -> How quickly python will check the queues for new voltage
             data to plot.  This value must be less than addqueuetime to ensure that
             every waveform is being plotted.
-        addqueuetime -> python waits <addqueuetime> seconds between each query about
-            the voltages from the oscilloscope.
-        q1 and q2 are the the queues which hold the voltage data for channel 1 and 2
-            on the oscilloscope.
+        addqueuetime -> the time between each query about the voltages from the
+            oscilloscope that the acquisition process aims for.  If reads take longer
+            than that, it goes as fast as it can without hogging the usb connection
+            (see scheduler.py).
+        ring is the shared memory ring buffer which the acquisition process writes
+            the voltage data for channel 1 and 2 into.
         """
         self.lock = RLock()
         self.checkqueuedelay = int(checkqueuedelay * 1000)  # in ms
@@ -45,34 +49,33 @@ class Rigolx:
         self.vpp = self.dev.askChannelScale(1) * 4
         self.vpp2 = self.dev.askChannelScale(2) * 4
         self.x = self.dev.getTimebase()
-        q1 = Queue()
-        q1.cancel_join_thread()
-        q2 = Queue()
-        q2.cancel_join_thread()
+        self.ring = ringbuffer.WaveformRing(channels=2)
+        self.last_seq = 0
         self.ch1 = False
         self.ch2 = False
-        self.start(q1, q2)
+        # the channels the acquisition process reads, kept in step with ch1/ch2
+        self.subscriptions = scheduler.Subscriptions(["CHAN1", "CHAN2"])
+        self.start()
 
-    def start(self, q1, q2):
+    def start(self):
         """
-        Render the GUI.  Start checking the voltage queues
+        Render the GUI.  Start checking the ring buffer for new frames
         """
         self.root = tk.Tk()
-        self.root.after(self.checkqueuedelay, self.checkQueue1, q1, q2)
+        self.root.after(self.checkqueuedelay, self.checkRing)
         self.root.title("Rigol DS1000D/E Interface")
-        self.makeWaveformFrame(q1, q2)
+        self.makeWaveformFrame()
         self.makeScalingFrame()
         self.makeInfoPanel()
         print("STARTING PROCESS 1")
-        self.t1 = Process(target=self.getWaveformData, args=(q1, q2))
+        self.t1 = Process(target=self.getWaveformData, args=(self.ring,))
         self.t1.start()
         self.root.mainloop()
 
     def refresh(self):
         """
         """
-        vpp1 = self.dev.measureVpp(1)
-        vpp2 = self.dev.measureVpp(2)
+        vpp1, vpp2 = self.askVpp()
         self.channel1vppentry.config(state="normal")
         self.channel1vppentry.delete(0, "end")
         self.channel1vppentry.insert("end", vpp1)
@@ -82,6 +85,13 @@ class Rigolx:
         self.channel2vppentry.insert("end", vpp2)
         self.channel2vppentry.config(state="readonly")
 
+    def askVpp(self):
+        """
+        Peak to peak voltage of both channels, asked for in one batch.
+        """
+        r = self.dev.askBatch([":MEAS:VPP? CHAN1", ":MEAS:VPP? CHAN2"])
+        return r[":MEAS:VPP? CHAN1"], r[":MEAS:VPP? CHAN2"]
+
     def setVoltsPerDiv(self, Event=None):
         """
         """
@@ -90,6 +100,7 @@ class Rigolx:
         time.sleep(.1)
         self.vpp = self.dev.askChannelScale(1) * 4
         self.wave.set_ylim(-self.vpp, self.vpp)
+        self.canvas.draw()
 
     def setVoltsPerDiv2(self, Event=None):
         """
@@ -99,6 +110,7 @@ class Rigolx:
         time.sleep(.1)
         self.vpp2 = self.dev.askChannelScale(2) * 4
         self.wave2.set_ylim(-self.vpp2, self.vpp2)
+        self.canvas.draw()
 
     def setSecPerDiv(self, Event=None):
         spd = self.timescaleentry.get()
@@ -107,35 +119,51 @@ class Rigolx:
         self.x = self.dev.getTimebase()
         self.wave.set_xlim(self.x[0], self.x[-1])
         self.wave2.set_xlim(self.x[0], self.x[-1])
+        self.canvas.draw()
 
-    def checkQueue1(self, q1, q2):
+    def checkRing(self):
         """
-        Notice there are 2 release statements in this method.  It is because
-            sometimes the method will not make it to the first release because of
-            the queues being empty, so I've written a second release method to
-            ensure that the lock is released
+        Plot the newest frame in the ring buffer, if there is one we haven't
+            plotted yet.  Frames that came in since the last check are skipped.
         """
         try:
-            data1 = q1.get(0)
-            data2 = q2.get(0)
-            # print(data)
-            # print(dir(self.wave))
-            if self.ch1:
-                # print(len(self.x))
-                # print(len(data1))
-                self.p.set_xdata(self.x[:len(data1)])
-                self.p.set_ydata(data1)
-            if self.ch2:
-                self.p2.set_xdata(self.x[:len(data2)])
-                self.p2.set_ydata(data2)
-        except Empty:
-            pass
+            frame = self.ring.latest(self.last_seq)
+            if frame is not None:
+                self.last_seq, (data1, data2) = frame
+                width = int(self.wave.bbox.width)
+                if self.ch1 and data1 is not None:
+                    self.p.set_data(*decimate.decimate(data1, width, self.dev.getTimebase(len(data1))))
+                if self.ch2 and data2 is not None:
+                    self.p2.set_data(*decimate.decimate(data2, width, self.dev.getTimebase(len(data2))))
+                if self.ch1 or self.ch2:
+                    self.blitLines()
         finally:
-            if self.ch1 or self.ch2:
-                self.wf.canvas.draw()
-            self.root.after(self.checkqueuedelay, self.checkQueue1, q1, q2)
+            self.root.after(self.checkqueuedelay, self.checkRing)
+
+    def onDraw(self, event=None):
+        """
+        Called after every full draw of the figure (including on resize).
+        The waveform lines are animated, so they are left out of the full draw.
+            What was drawn is saved as the background to blit them onto.
+        """
+        self.background = self.canvas.copy_from_bbox(self.wf.bbox)
+        self.wave.draw_artist(self.p)
+        self.wave2.draw_artist(self.p2)
 
-    def makeWaveformFrame(self, q1, q2):
+    def blitLines(self):
+        """
+        Redraw only the waveform lines on top of the saved background, which is
+            much quicker than redrawing the axes, ticks and grids every frame.
+        """
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.wave.draw_artist(self.p)
+        self.wave2.draw_artist(self.p2)
+        self.canvas.blit(self.wf.bbox)
+
+    def makeWaveformFrame(self):
         """
         Add the waveform frame to self.root
         https://sukhbinder.wordpress.com/2014/06/10/matplotlib-embedded-with-tkinter/
@@ -174,8 +202,8 @@ class Rigolx:
         self.wave2.title.set_color('#8c8c8c')
         self.wave2.grid()
 
-        self.p, = self.wave.plot([], [], linewidth=2, color="#007acc", label="Channel 1")
-        self.p2, = self.wave2.plot([], [], linewidth=2, color="#ff4d4d", label="Channel 2")
+        self.p, = self.wave.plot([], [], linewidth=2, color="#007acc", label="Channel 1", animated=True)
+        self.p2, = self.wave2.plot([], [], linewidth=2, color="#ff4d4d", label="Channel 2", animated=True)
         # self.wave.legend(["Channel 1", "Channel 2"])
         # print(dir(self.p))
 
@@ -189,6 +217,8 @@ class Rigolx:
         self.wave2.set_ylim(-self.vpp2, self.vpp2)
         self.wave2.set_xlim(self.x[0],self.x[-1])
 
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self.onDraw)
         self.canvas.show()
         self.toolbar_frame = tk.Frame()
         self.toolbar = NavigationToolbar2TkAgg(self.canvas, self.toolbar_frame)
@@ -301,8 +331,7 @@ class Rigolx:
 
         self.infoframe.grid(row=0, column=2, rowspan=2, sticky="N")
 
-        vpp1 = self.dev.measureVpp(1)
-        vpp2 = self.dev.measureVpp(2)
+        vpp1, vpp2 = self.askVpp()
         self.channel1vppentry.insert("end", vpp1)
         self.channel1vppentry.config(state="readonly")
         self.channel2vppentry.insert("end", vpp2)
@@ -332,24 +361,22 @@ class Rigolx:
         elif channel == 2 and not self.ch2:
             x = self.dev.channelDisplay(2, True)
             self.ch2 = True
+        self.subscriptions.subscribe("CHAN1", self.ch1)
+        self.subscriptions.subscribe("CHAN2", self.ch2)
         self.wf.canvas.draw()
         # if not self.ch1 and not self.ch2:
             # self.t1.join()
             # self.t1.terminate()
 
-    def getWaveformData(self, q1, q2):
+    def getWaveformData(self, ring):
         """
         dev - device connection
         rigol - rigolx class instance
+        Runs in the acquisition process, reading the subscribed channels together
+            and writing them into ring whenever the scope has a new acquisition.
         """
-        while True:
-            # start_time = time.time()
-            y1 = self.dev.getWaveform("CHAN1")
-            q1.put(y1)
-            y2 = self.dev.getWaveform("CHAN2")
-            q2.put(y2)
-            time.sleep(self.addqueuetime)
-            # print(time.time() - start_time)
+        sched = scheduler.AcquisitionScheduler(self.dev, target_fps=1 / self.addqueuetime)
+        sched.run(self.subscriptions.subscribed, lambda frame: ring.put([frame.waveforms.get("CHAN1"), frame.waveforms.get("CHAN2")]))
 
 
 def main():
@@ -0,0 +1,94 @@
+"""
+ringbuffer.py
+
+A fixed size ring of waveform slots in shared memory, for handing waveforms
+    from an acquisition process to the GUI without pickling them through a
+    multiprocessing.Queue.
+The writer fills the next slot and bumps the sequence number.  The reader
+    only ever wants the newest frame, so it can't fall behind, and frames it
+    didn't get to are simply overwritten.  Each slot carries its sequence
+    number, which the reader checks before and after copying a slot out so
+    that a slot being overwritten mid copy is detected and read again.
+
+Create the ring before starting the acquisition process so that both sides
+    share the same memory.
+"""
+from multiprocessing.sharedctypes import RawArray, RawValue
+import numpy as np
+
+
+WRITING = -1
+
+
+class WaveformRing():
+
+    def __init__(self, slots=4, channels=2, max_points=16384):
+        """
+        slots -> how many frames the ring holds.  More slots make it less likely
+            that the writer laps a slot the reader is copying.
+        channels -> waveforms per frame.
+        max_points -> longest waveform a slot can hold.
+        """
+        self.slots = slots
+        self.channels = channels
+        self.max_points = max_points
+        self.shared_data = RawArray("d", slots * channels * max_points)
+        self.shared_lengths = RawArray("l", slots * channels)
+        self.shared_seqs = RawArray("l", slots)
+        self.head = RawValue("l", 0)
+        self.views = None
+
+    def arrays(self):
+        """
+        numpy views of the shared memory, made lazily so that each process
+            makes its own.
+        """
+        if self.views is None:
+            data = np.ctypeslib.as_array(self.shared_data).reshape(self.slots, self.channels, self.max_points)
+            lengths = np.ctypeslib.as_array(self.shared_lengths).reshape(self.slots, self.channels)
+            self.views = data, lengths
+        return self.views
+
+    def put(self, waveforms):
+        """
+        Write a frame.  <waveforms> has one array per channel, or None for a
+            channel that wasn't acquired.  Only one process may write.
+        returns the sequence number of the frame.
+        """
+        data, lengths = self.arrays()
+        seq = self.head.value + 1
+        slot = seq % self.slots
+        self.shared_seqs[slot] = WRITING
+        for channel, waveform in enumerate(waveforms):
+            if waveform is None:
+                lengths[slot, channel] = 0
+                continue
+            n = len(waveform)
+            if n > self.max_points:
+                raise ValueError("Waveform of {} points doesn't fit in a {} point slot.".format(n, self.max_points))
+            data[slot, channel, :n] = waveform
+            lengths[slot, channel] = n
+        self.shared_seqs[slot] = seq
+        self.head.value = seq
+        return seq
+
+    def latest(self, last_seq=0, retries=3):
+        """
+        The newest frame, if it is newer than <last_seq>.
+        returns (seq, [waveform or None for each channel]) with the waveforms
+            copied out of shared memory, or None if there is nothing new.
+        """
+        data, lengths = self.arrays()
+        for _ in range(retries):
+            seq = self.head.value
+            if seq <= last_seq:
+                return None
+            slot = seq % self.slots
+            if self.shared_seqs[slot] != seq:
+                continue
+            n = lengths[slot].copy()
+            waveforms = [data[slot, channel, :n[channel]].copy() if n[channel] else None
+                         for channel in range(self.channels)]
+            if self.shared_seqs[slot] == seq:
+                return seq, waveforms
+        return None
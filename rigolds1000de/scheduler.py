@@ -0,0 +1,128 @@
+"""
+scheduler.py
+
+Paces continuous acquisition from the oscilloscope.  Instead of sleeping a
+    fixed time after every read, the scheduler measures how long reads
+    actually take and waits only as long as it needs to to hit the target
+    frame rate, while always leaving part of the bus free for other commands
+    (like settings changes from the GUI).
+It also asks the trigger status before reading, so that nothing is fetched
+    while the scope is waiting for a trigger or after it has stopped and its
+    last acquisition was already read.
+"""
+from __future__ import division
+from multiprocessing.sharedctypes import RawArray
+from timeit import default_timer as clock
+import time
+
+
+class Subscriptions():
+    """
+    Which sources the acquisition should read, kept in shared memory so that
+        a GUI can subscribe and unsubscribe while another process acquires.
+        Create it before starting the other process.
+    """
+    def __init__(self, sources=("CHAN1", "CHAN2")):
+        self.sources = list(sources)
+        self.flags = RawArray("b", len(self.sources))
+
+    def subscribe(self, source, on=True):
+        self.flags[self.sources.index(source)] = on
+
+    def unsubscribe(self, source):
+        self.subscribe(source, False)
+
+    def isSubscribed(self, source):
+        return bool(self.flags[self.sources.index(source)])
+
+    def subscribed(self):
+        """
+        The list of subscribed sources, which can be passed to AcquisitionScheduler.run.
+        """
+        return [source for source, on in zip(self.sources, self.flags) if on]
+
+
+class AcquisitionScheduler():
+
+    def __init__(self, scope, target_fps=10.0, idle_fraction=.2, poll_interval=.02, smoothing=.2):
+        """
+        scope -> rigol.Rigol to acquire from.
+        target_fps -> frames per second to aim for.
+        idle_fraction -> share of the time the bus is left alone, so reads are
+            never back to back even if the target can't be reached.
+        poll_interval -> seconds to wait before asking again when there was
+            nothing new to read.
+        smoothing -> weight of the newest read in the moving average latency.
+        """
+        self.scope = scope
+        self.target_fps = target_fps
+        self.idle_fraction = idle_fraction
+        self.poll_interval = poll_interval
+        self.smoothing = smoothing
+        self.latency = None
+        self.last_status = None
+        self.index = 0
+        self.cycle_start = clock()
+        self.fetched = False
+
+    def fresh(self):
+        """
+        True if the scope has an acquisition we haven't read yet.
+        The status is one of RUN, STOP, T'D, WAIT or AUTO.
+        """
+        status = self.scope.askTriggerStatus().strip()
+        changed = status != self.last_status
+        self.last_status = status
+        if status == "WAIT":
+            return False
+        if status == "STOP":
+            # the stopped acquisition only needs to be read once
+            return changed
+        return True
+
+    def acquire(self, sources):
+        """
+        Read <sources> if there is anything new to read.
+        returns a capture.Frame, or None if nothing was read.
+        """
+        self.cycle_start = clock()
+        self.fetched = False
+        if not sources or not self.fresh():
+            return None
+        start = clock()
+        frame = self.scope.getWaveforms(sources, index=self.index)
+        elapsed = clock() - start
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += self.smoothing * (elapsed - self.latency)
+        self.fetched = True
+        self.index += 1
+        return frame
+
+    def delay(self):
+        """
+        Seconds to wait before the next acquire.
+        """
+        if not self.fetched:
+            return self.poll_interval
+        elapsed = clock() - self.cycle_start
+        period = 1 / self.target_fps
+        # the least we can wait and still leave idle_fraction of the bus free
+        rest = self.latency * self.idle_fraction / (1 - self.idle_fraction)
+        return max(period - elapsed, rest)
+
+    def wait(self):
+        time.sleep(self.delay())
+
+    def run(self, sources, callback, stop=None):
+        """
+        Acquire until stop() returns True (or forever), calling callback(frame)
+            with every new frame.
+        sources -> function returning the list of sources to read this cycle.
+        """
+        while stop is None or not stop():
+            frame = self.acquire(sources())
+            if frame is not None:
+                callback(frame)
+            self.wait()
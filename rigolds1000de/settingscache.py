@@ -0,0 +1,190 @@
+"""
+settingscache.py
+
+A caching layer that sits between Rigol and its backend (UsbCon, SimCon, ...)
+    so that asking for a setting we already know doesn't cost a USB round trip.
+Values are learned from earlier queries, and from the setter commands we write
+    for the few settings the scope stores exactly as written.
+    Anything that has no setter (waveform data, measurements, trigger status,
+    sampling rate) always goes to the scope.
+
+A cache hit only takes the cache's own small lock, never the connection's, so
+    it doesn't wait for a waveform transfer that is in progress.  Misses and
+    setters hold the connection's lock so that the value stored is the one
+    the scope has.  Behind a WorkerCon they borrow it at the priority the
+    worker gives the same command on its own (INTERACTIVE for setters, QUERY
+    for queries), not at the lock's BULK, so they still go ahead of waveform
+    reads.
+
+The cache can't see knobs being turned on the front panel, so call
+    invalidate() (or Rigol.refreshAttributes) after changing things by hand.
+    :AUTO, *RST and :TRIG%50 change lots of settings at once and clear the
+    whole cache on their own.
+"""
+from contextlib import contextmanager
+import threading
+import ioworker
+
+
+class SettingsCache():
+    """
+    Wraps a backend connection and answers setting queries from memory when it
+        can.  Anything not defined here is passed straight through to the
+        wrapped connection.
+    """
+    # queries whose answer changes without us writing anything
+    volatile = (":WAV:", ":MEAS:", ":TRIG:STAT", ":ACQ:SAMP", ":CHAN1:MEMD", ":CHAN2:MEMD")
+    # commands after which nothing we know can be trusted
+    dirty = ("*RST", ":AUTO", ":TRIG%50")
+    # the only settings whose written value is the value the scope uses, since
+    #     Rigol checks them against the full list of valid values first.  The
+    #     scope clamps or rounds anything else (scales to 1-2-5 steps, offsets
+    #     and holdoff to their ranges), so it must be asked for again.
+    exact = (":ACQ:AVER", ":DISP:BRIG", ":DISP:INT")
+    # writing the key changes the value of the listed settings
+    dependents = {
+        ":CHAN1:PROB": [":CHAN1:SCAL", ":CHAN1:OFFS"],
+        ":CHAN2:PROB": [":CHAN2:SCAL", ":CHAN2:OFFS"],
+        ":CHAN1:SCAL": [":CHAN1:OFFS"],
+        ":CHAN2:SCAL": [":CHAN2:OFFS"],
+        ":TIM:SCAL": [":TIM:OFFS"],
+        ":TIM:DEL:SCAL": [":TIM:DEL:OFFS"],
+    }
+
+    def __init__(self, dev):
+        """
+        dev -> the connection to wrap, e.g. a UsbCon.
+        """
+        self.dev = dev
+        self.lock = dev.lock
+        self.values_lock = threading.Lock()
+        self.values = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        if name == "dev":
+            raise AttributeError(name)
+        return getattr(self.dev, name)
+
+    def key(self, message):
+        """
+        The header a query or setter is stored under, or None if it shouldn't
+            be cached.  ":CHAN1:SCAL?" and ":CHAN1:SCAL 0.5" both give ":CHAN1:SCAL".
+        """
+        header = message.strip().split(" ")[0].upper()
+        if not header.startswith(("*", ":")):
+            header = ":" + header
+        header = header.rstrip("?")
+        if header.startswith(self.volatile):
+            return None
+        return header
+
+    def invalidate(self, message=None):
+        """
+        Forget the cached value for <message> (a query or a header), or
+            everything if <message> is None.
+        """
+        with self.values_lock:
+            if message is None:
+                self.values.clear()
+            else:
+                self.forget(self.key(message))
+
+    def forget(self, header):
+        # only called with values_lock held
+        self.values.pop(header, None)
+        for dependent in self.dependents.get(header, []):
+            self.values.pop(dependent, None)
+
+    def record(self, message):
+        """
+        Learn what we can from a command that was just written.
+        Only the exact settings are remembered.  Anything else may have been
+            clamped or rounded by the scope, and enumerated settings are
+            answered with a different spelling than the one we write, e.g.
+            ":ACQ:TYPE NORM" -> "NORMAL".
+        """
+        header = self.key(message)
+        if header is None or message.strip().endswith("?"):
+            return
+        with self.values_lock:
+            if header in self.dirty:
+                self.values.clear()
+                return
+            self.forget(header)
+            arg = message.strip().partition(" ")[2].strip()
+            if header in self.exact and arg:
+                self.values[header] = arg
+
+    def cached(self, header):
+        """
+        The cached answer for <header>, or None, counted as a hit or a miss.
+        """
+        with self.values_lock:
+            msg = self.values.get(header)
+            if msg is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return msg
+
+    def store(self, header, msg):
+        with self.values_lock:
+            self.values[header] = msg
+
+    @contextmanager
+    def locked(self, priority):
+        """
+        Hold the connection's lock, waiting at <priority> if it is a WorkerLock.
+        """
+        if isinstance(self.lock, ioworker.WorkerLock):
+            self.lock.acquire(priority=priority)
+        else:
+            self.lock.acquire()
+        try:
+            yield
+        finally:
+            self.lock.release()
+
+    def write(self, message, encoding="utf-8"):
+        with self.locked(ioworker.INTERACTIVE):
+            msg = self.dev.write(message, encoding)
+            self.record(message)
+        return msg
+
+    def ask(self, message, num=-1, encoding="utf-8"):
+        header = self.key(message)
+        # queries with an argument, like ":MEAS:VPP? CHAN1", aren't settings
+        if header is None or not message.strip().endswith("?"):
+            return self.dev.ask(message, num, encoding)
+        msg = self.cached(header)
+        if msg is not None:
+            return msg
+        with self.locked(ioworker.QUERY):
+            msg = self.dev.ask(message, num, encoding)
+            self.store(header, msg)
+        return msg
+
+    def ask_many(self, messages, encoding="utf-8"):
+        """
+        Only the queries that can't be answered from the cache are passed on.
+        """
+        responses = [None] * len(messages)
+        headers = [None] * len(messages)
+        missing = []
+        for i, message in enumerate(messages):
+            header = self.key(message)
+            if header is not None and message.strip().endswith("?"):
+                headers[i] = header
+                responses[i] = self.cached(header)
+            if responses[i] is None:
+                missing.append(i)
+        if missing:
+            with self.locked(ioworker.QUERY):
+                answers = self.dev.ask_many([messages[i] for i in missing], encoding)
+                for i, msg in zip(missing, answers):
+                    responses[i] = msg
+                    if headers[i] is not None:
+                        self.store(headers[i], msg)
+        return responses
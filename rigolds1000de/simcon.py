@@ -0,0 +1,381 @@
+"""
+simcon.py
+
+A software stand-in for the Rigol DS1000D/E so that rigol.py (and anything
+    built on top of it) can be run and profiled without a scope on the bench.
+SimInstrument answers the subset of SCPI that rigol.py uses with the same
+    response formats as the real scope, and fakes the USB cost with a
+    configurable per-command latency and bus bandwidth.
+SimCon is a UsbCon that talks to a SimInstrument instead of usbtmc.Instrument,
+    so it is a drop in replacement wherever a UsbCon is used.
+
+    >>> r = rigol.Rigol("sim", latency=.002, bandwidth=600e3)
+"""
+from __future__ import division
+from multiprocessing import RLock
+import time
+import numpy as np
+import usbcon as uc
+import measure
+
+
+class SimTimeout(IOError):
+    """
+    Raised where the real scope would leave a query unanswered and usbtmc
+        would eventually time out.
+    """
+    pass
+
+
+class SimInstrument():
+    """
+    Mimics the parts of usbtmc.Instrument that UsbCon uses.
+
+    latency -> seconds charged for every command sent.  Either a float or a dict
+        of {header prefix: seconds}, e.g. {":WAV:DATA": .02, "": .002}.  The
+        longest matching prefix wins.
+    bandwidth -> bytes/sec of the simulated bus used to charge for reads.
+        None means reads are free.
+    noise -> rms noise added to the synthetic waveforms, in volts.
+    seed -> seed for the noise generator so that runs are repeatable.
+    """
+    screen_points = 600
+    # memory depth, indexed by [long memory][single channel]
+    memory_depths = {(False, False): 8192, (False, True): 16384,
+                     (True, False): 524288, (True, True): 1048576}
+    # long names returned by the scope for the short forms we send
+    long_names = {
+        ":ACQ:TYPE": {"NORM": "NORMAL", "AVER": "AVERAGE", "PEAK": "PEAKDETECT"},
+        ":ACQ:MODE": {"RTIM": "REAL_TIME", "ETIM": "EQUAL_TIME"},
+        ":ACQ:MEMD": {"NORM": "NORMAL", "LONG": "LONG"},
+        ":DISP:TYPE": {"VECT": "VECTORS", "DOTS": "DOTS"},
+        ":TIM:MODE": {"MAIN": "MAIN", "DEL": "DELAYED"},
+        ":TIM:FORM": {"XY": "X-Y", "YT": "Y-T", "SCAN": "SCANNING"},
+        ":WAV:POIN:MODE": {"NORM": "NORMAL", "MAX": "MAXIMUM", "RAW": "RAW"},
+        ":KEY:LOCK": {"ENAB": "ENABLE", "DIS": "DISABLE"},
+    }
+    numeric = (":CHAN1:SCAL", ":CHAN2:SCAL", ":CHAN1:OFFS", ":CHAN2:OFFS",
+               ":TIM:SCAL", ":TIM:OFFS", ":TIM:DEL:SCAL", ":TIM:DEL:OFFS",
+               ":TRIG:HOLD")
+    defaults = {
+        ":ACQ:TYPE": "NORM",
+        ":ACQ:MODE": "RTIM",
+        ":ACQ:AVER": "16",
+        ":ACQ:MEMD": "NORM",
+        ":DISP:TYPE": "VECT",
+        ":DISP:GRID": "FULL",
+        ":DISP:PERS": "OFF",
+        ":DISP:MNUD": "Infinite",
+        ":DISP:MNUS": "ON",
+        ":DISP:BRIG": "16",
+        ":DISP:INT": "16",
+        ":TIM:MODE": "MAIN",
+        ":TIM:OFFS": "0",
+        ":TIM:SCAL": "0.0005",
+        ":TIM:DEL:OFFS": "0",
+        ":TIM:DEL:SCAL": "0.0005",
+        ":TIM:FORM": "YT",
+        ":TRIG:MODE": "EDGE",
+        ":TRIG:EDGE:SOUR": "CHAN1",
+        ":TRIG:EDGE:SWE": "AUTO",
+        ":TRIG:EDGE:COUP": "DC",
+        ":TRIG:EDGE:SLOP": "POS",
+        ":TRIG:EDGE:SENS": "0.5",
+        ":TRIG:HOLD": "5e-07",
+        ":CHAN1:BWL": "OFF",
+        ":CHAN2:BWL": "OFF",
+        ":CHAN1:COUP": "DC",
+        ":CHAN2:COUP": "DC",
+        ":CHAN1:DISP": "ON",
+        ":CHAN2:DISP": "ON",
+        ":CHAN1:INV": "OFF",
+        ":CHAN2:INV": "OFF",
+        ":CHAN1:OFFS": "0",
+        ":CHAN2:OFFS": "0",
+        ":CHAN1:PROB": "1",
+        ":CHAN2:PROB": "1",
+        ":CHAN1:SCAL": "1",
+        ":CHAN2:SCAL": "0.5",
+        ":CHAN1:FILT": "OFF",
+        ":CHAN2:FILT": "OFF",
+        ":CHAN1:VERN": "OFF",
+        ":CHAN2:VERN": "OFF",
+        ":WAV:POIN:MODE": "NORM",
+        ":KEY:LOCK": "ENAB",
+        ":MEAS:TOT": "OFF",
+        ":MEAS:SOUR": "CHAN1",
+    }
+    # short form of each :MEAS query -> key of the measure.measure result, None
+    #     for the ones between the two channels, which aren't simulated.  The
+    #     phase queries of newer firmware are left out, so they time out like
+    #     they do on the firmware being simulated.
+    measure_keys = {"VPP": "vpp", "VMAX": "vmax", "VMIN": "vmin", "VAMP": "vamp",
+                    "VTOP": "vtop", "VBAS": "vbase", "VAV": "vavg", "VRMS": "vrms",
+                    "OVER": "overshoot", "PRES": "preshoot", "FREQ": "freq",
+                    "RIS": "rise", "FALL": "fall", "PER": "period",
+                    "PWID": "pwidth", "NWID": "nwidth", "PDUT": "pduty", "NDUT": "nduty",
+                    "PDEL": None, "NDEL": None}
+    measure_headers = set(":MEAS:" + item for item in measure_keys)
+    # (shape, amplitude in V, frequency in Hz) of the signal on each input
+    signals = {1: ("sine", 1.0, 1e3), 2: ("square", .5, 2e3)}
+
+    def __init__(self, latency=0.0, bandwidth=None, noise=.01, seed=0,
+                 idn="Rigol Technologies,DS1102E,SIM0000000001,00.04.02.01.00"):
+        """
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.noise = noise
+        self.idn = idn
+        self.random = np.random.RandomState(seed)
+        self.state = dict(self.defaults)
+        self.running = True
+        self.output = b""
+        self.output_pos = 0
+
+    def commandLatency(self, header):
+        """
+        Seconds to charge for sending <header>.
+        """
+        if not isinstance(self.latency, dict):
+            return self.latency
+        best = ""
+        for prefix in self.latency:
+            if header.startswith(prefix) and len(prefix) >= len(best):
+                best = prefix
+        return self.latency.get(best, 0.0)
+
+    def delay(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    ####################
+    # usbtmc interface #
+    ####################
+    def write_raw(self, data):
+        """
+        Every message is handled as soon as it is written.  Any response is
+            queued up to be collected by read_raw.
+        Several commands can be sent at once separated by ";", the responses
+            to any queries among them are joined with ";".
+        """
+        if not isinstance(data, str):
+            data = data.decode("ascii")
+        units = data.strip().split(";")
+        responses = []
+        for i, unit in enumerate(units):
+            header, _, arg = unit.strip().partition(" ")
+            header = self.normalize(header)
+            if i == 0:
+                self.delay(self.commandLatency(header))
+            if header == ":WAV:DATA?" and len(units) > 1:
+                raise SimTimeout("Block data can't be part of a compound query.")
+            response = self.handle(header, arg.strip())
+            if response is not None:
+                responses.append(response)
+        if len(responses) > 1:
+            response = ";".join(responses)
+        else:
+            response = responses[0] if responses else None
+        if response is not None:
+            if not isinstance(response, bytes):
+                response = (response + "\n").encode("ascii")
+            self.output = response
+            self.output_pos = 0
+
+    def read_raw(self, num=-1):
+        """
+        Returns up to <num> bytes of the pending response, or all of it if
+            <num> is -1.
+        Like the real scope (see python-usbtmc's rigol_quirk), every read starts
+            the response over from the beginning until it has been read whole.
+        """
+        remaining = len(self.output) - self.output_pos
+        if remaining <= 0:
+            raise SimTimeout("Nothing to read.  Was a query sent?")
+        if num is None or num < 0 or num > remaining:
+            num = remaining
+        if num == remaining:
+            self.output_pos = len(self.output)
+        if self.bandwidth:
+            self.delay(num / self.bandwidth)
+        return self.output[:num]
+
+    def ask_raw(self, data, num=-1):
+        self.write_raw(data)
+        return self.read_raw(num)
+
+    def write(self, message, encoding="utf-8"):
+        self.write_raw(message.encode(encoding))
+
+    def read(self, num=-1, encoding="utf-8"):
+        return self.read_raw(num).decode(encoding).rstrip("\r\n")
+
+    def ask(self, message, num=-1, encoding="utf-8"):
+        self.write(message, encoding)
+        return self.read(num, encoding)
+
+    ###################
+    # SCPI processing #
+    ###################
+    def normalize(self, header):
+        header = header.upper()
+        if not header.startswith(("*", ":")):
+            header = ":" + header
+        return header
+
+    def handle(self, header, arg):
+        """
+        Carry out a single command.  Returns the response for queries and None
+            for everything else.
+        """
+        if header == "*IDN?":
+            return self.idn
+        if header == "*RST":
+            self.state = dict(self.defaults)
+            self.running = True
+            return None
+        if header == ":RUN":
+            self.running = True
+            return None
+        if header == ":STOP":
+            self.running = False
+            return None
+        if header in (":AUTO", ":HARDCOPY", ":FORC", ":TRIG%50", ":DISP:CLE"):
+            return None
+        if header == ":TRIG:STAT?":
+            return "T'D" if self.running else "STOP"
+        if header == ":WAV:DATA?":
+            return self.waveformBlock(arg)
+        if header.startswith(":MEAS:") and header[:-1] in self.measure_headers:
+            return self.measure(header[6:-1], arg)
+        if header == ":ACQ:SAMP?":
+            return "{:.3e}".format(self.samplingRate())
+        if header in (":CHAN1:MEMD?", ":CHAN2:MEMD?"):
+            return str(self.memoryDepth())
+        if header.endswith("?"):
+            key = header[:-1]
+            if key not in self.state:
+                raise SimTimeout("No response to {}.".format(header))
+            value = self.state[key]
+            if key in self.numeric:
+                return "{:.3e}".format(float(value))
+            return self.long_names.get(key, {}).get(value, value)
+        self.state[header] = self.clamp(header, arg)
+        return None
+
+    def clamp(self, header, arg):
+        """
+        The value the scope actually keeps when <arg> is written to <header>.
+            Channel offsets are limited to +-2V below 250mV/div and +-40V
+            above, like on the real scope.
+        """
+        if header in (":CHAN1:OFFS", ":CHAN2:OFFS"):
+            scale = float(self.state[header[:-4] + "SCAL"])
+            limit = 2.0 if scale < .25 else 40.0
+            return repr(min(max(float(arg), -limit), limit))
+        return arg
+
+    #############
+    # WAVEFORMS #
+    #############
+    def channelDisplayed(self, channel):
+        return self.state[":CHAN{}:DISP".format(channel)] in ("ON", "1")
+
+    def memoryDepth(self):
+        long_memory = self.state[":ACQ:MEMD"] == "LONG"
+        single = not (self.channelDisplayed(1) and self.channelDisplayed(2))
+        return self.memory_depths[(long_memory, single)]
+
+    def samplingRate(self):
+        single = not (self.channelDisplayed(1) and self.channelDisplayed(2))
+        max_rate = 1e9 if single else 5e8
+        time_scale = float(self.state[":TIM:SCAL"])
+        return min(max_rate, self.memoryDepth() / (12 * time_scale))
+
+    def timePoints(self, screen=False):
+        """
+        Sample times of the record that :WAV:DATA? would currently return, or of
+            the 600 points on the screen if <screen> is True.
+        """
+        time_scale = float(self.state[":TIM:SCAL"])
+        time_offset = float(self.state[":TIM:OFFS"])
+        mode = self.state[":WAV:POIN:MODE"]
+        if screen or mode == "NORM" or self.running:
+            n = self.screen_points
+            step = time_scale / 50
+        else:
+            n = self.memoryDepth()
+            step = 1 / self.samplingRate()
+        return time_offset + (np.arange(n) - n / 2) * step
+
+    def signal(self, channel, t):
+        """
+        The voltage present at the input of <channel> at times <t>.
+        """
+        shape, amplitude, frequency = self.signals[channel]
+        phase = 2 * np.pi * frequency * t
+        if shape == "sine":
+            v = amplitude * np.sin(phase)
+        else:
+            v = amplitude * np.sign(np.sin(phase))
+        if self.noise:
+            v = v + self.random.normal(0, self.noise, len(t))
+        return v
+
+    def voltages(self, channel, screen=False):
+        return self.signal(channel, self.timePoints(screen))
+
+    def adcCounts(self, channel, v):
+        """
+        Inverse of Rigol.convertVoltages.
+        """
+        scale = float(self.state[":CHAN{}:SCAL".format(channel)])
+        offset = float(self.state[":CHAN{}:OFFS".format(channel)])
+        counts = 125 - (v + offset) * 25 / scale
+        return np.clip(np.round(counts), 0, 255).astype(np.uint8)
+
+    def waveformBlock(self, source):
+        """
+        IEEE 488.2 definite length block, "#8" followed by the 8 digit payload
+            length, which is the 10 byte header that rigol.py skips.
+        """
+        if source not in ("CHAN1", "CHAN2"):
+            raise SimTimeout("Source {} is not simulated.".format(source))
+        payload = self.adcCounts(int(source[-1]), self.voltages(int(source[-1]))).tobytes()
+        return "#8{:08d}".format(len(payload)).encode("ascii") + payload
+
+    def measure(self, item, source):
+        """
+        The :MEAS queries, computed with measure.py from the screen record,
+            which is what the scope measures whatever the points mode.
+        Answers "****" for the queries between the two channels, like the scope
+            does when it can't make a measurement, and 9.9E37 for nan.
+        """
+        if source not in ("CHAN1", "CHAN2"):
+            source = self.state.get(":MEAS:SOUR", "CHAN1")
+        if item not in self.measure_keys:
+            raise SimTimeout("Measurement {} is not simulated.".format(item))
+        key = self.measure_keys[item]
+        if key is None:
+            return "****"
+        v = self.voltages(int(source[-1]), screen=True)
+        value = measure.measure(v, float(self.state[":TIM:SCAL"]) / 50)[key]
+        if np.isnan(value):
+            value = 9.9e37
+        return "{:.3e}".format(value)
+
+
+class SimCon(uc.UsbCon):
+    """
+    SIMULATED BACKEND
+    A UsbCon whose instrument is a SimInstrument.  Keyword arguments are passed
+        along to SimInstrument.
+    """
+    def __init__(self, max_compound=1, **kwargs):
+        """
+        """
+        self.max_compound = max_compound
+        self.lock = RLock()
+        self.connect_times = {}
+        self.instr = SimInstrument(**kwargs)
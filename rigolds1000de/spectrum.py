@@ -0,0 +1,235 @@
+"""
+spectrum.py
+
+Spectra of waveforms computed on the computer, instead of reading the scope's
+    own FFT (which is coarse and another usb round trip).  Everything works
+    along the last axis, so both channels (or many captures) stacked in a 2-D
+    array are transformed in one call.
+
+    >>> dt = sampleInterval(r.getTimebase())
+    >>> f, mag = magnitude(r.getWaveform("CHAN1"), dt)
+
+Windows and frequency axes are cached by length, since a stream of captures
+    keeps asking for the same ones.  Only the CACHE_SIZE most recently used of
+    each are kept.  Amplitudes are corrected for the window's
+    gain, so a sine of amplitude A shows up as a peak of height A.
+"""
+from __future__ import division
+from collections import OrderedDict
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+# flat top window coefficients (as in scipy.signal.flattop)
+FLATTOP = [0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368]
+
+CACHE_SIZE = 32
+_windows = OrderedDict()
+_frequencies = OrderedDict()
+
+
+def _lookup(cache, key):
+    # moves a hit to the end, so the front of the cache is the least recently used
+    value = cache.pop(key, None)
+    if value is not None:
+        cache[key] = value
+    return value
+
+
+def _remember(cache, key, value):
+    cache[key] = value
+    while len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def window(name, n):
+    """
+    A cached, read only window of length <n>.  <name> is one of "rect", "hann",
+        "hamming", "blackman" or "flattop".
+    """
+    key = (name, n)
+    w = _lookup(_windows, key)
+    if w is None:
+        if name == "rect":
+            w = np.ones(n)
+        elif name == "hann":
+            w = np.hanning(n)
+        elif name == "hamming":
+            w = np.hamming(n)
+        elif name == "blackman":
+            w = np.blackman(n)
+        elif name == "flattop":
+            k = 2 * np.pi * np.arange(n) / max(n - 1, 1)
+            w = sum((-1) ** i * a * np.cos(i * k) for i, a in enumerate(FLATTOP))
+        else:
+            raise ValueError("Unknown window {}.".format(name))
+        w.flags.writeable = False
+        _remember(_windows, key, w)
+    return w
+
+
+def frequencies(n, dt):
+    """
+    Cached, read only frequencies of the rfft of <n> samples <dt> seconds apart.
+    """
+    key = (n, dt)
+    f = _lookup(_frequencies, key)
+    if f is None:
+        f = np.fft.rfftfreq(n, dt)
+        f.flags.writeable = False
+        _remember(_frequencies, key, f)
+    return f
+
+
+def sampleInterval(time_axis):
+    """
+    Seconds between samples, from the x values of a waveform, e.g. Rigol.getTimebase().
+    """
+    step = getattr(time_axis, "step", None)
+    if step is not None:
+        return float(step)
+    return float(time_axis[1] - time_axis[0])
+
+
+def transform(data, dt, window_name="hann", nfft=None):
+    """
+    Single sided spectrum of <data> along its last axis.
+    nfft - zero pad each waveform to this many points, or if it is shorter
+        than the waveform, transform only its first <nfft> points.
+    returns (frequencies, complex spectrum), scaled so that the magnitude of a
+        sine's bin is its amplitude.
+    """
+    data = np.asarray(data, np.float64)
+    nfft = nfft or data.shape[-1]
+    # the window (and its gain) has to cover what is transformed, not the
+    #     whole waveform
+    data = data[..., :nfft]
+    w = window(window_name, data.shape[-1])
+    spec = np.fft.rfft(data * w, nfft, axis=-1)
+    # every bin but DC (and Nyquist for even lengths) has a mirror image
+    spec *= 2 / w.sum()
+    spec[..., 0] /= 2
+    if nfft % 2 == 0:
+        spec[..., -1] /= 2
+    return frequencies(nfft, dt), spec
+
+
+def magnitude(data, dt, window_name="hann", nfft=None, db=False):
+    """
+    returns (frequencies, amplitude in volts), or in dBV if db is True.
+    """
+    f, spec = transform(data, dt, window_name, nfft)
+    mag = np.abs(spec)
+    if db:
+        with np.errstate(divide="ignore"):
+            mag = 20 * np.log10(mag)
+    return f, mag
+
+
+def phase(data, dt, window_name="hann", nfft=None):
+    """
+    returns (frequencies, phase in radians)
+    """
+    f, spec = transform(data, dt, window_name, nfft)
+    return f, np.angle(spec)
+
+
+def segments(data, length, step):
+    """
+    Overlapping segments of <data> along its last axis, as a view.
+    returns an array of shape data.shape[:-1] + (number of segments, length)
+    """
+    data = np.ascontiguousarray(data)
+    n = data.shape[-1]
+    count = 1 + (n - length) // step
+    shape = data.shape[:-1] + (count, length)
+    strides = data.strides[:-1] + (data.strides[-1] * step, data.strides[-1])
+    return as_strided(data, shape, strides, writeable=False)
+
+
+def welch(data, dt, length=256, overlap=.5, window_name="hann"):
+    """
+    Power spectral density by Welch's method: the waveform is cut into
+        overlapping windowed segments of <length> points and their
+        periodograms averaged, trading resolution for less noise.
+    returns (frequencies, density in V**2/Hz)
+    """
+    data = np.asarray(data, np.float64)
+    length = min(length, data.shape[-1])
+    step = max(1, int(length * (1 - overlap)))
+    segs = segments(data, length, step)
+    segs = segs - segs.mean(axis=-1, keepdims=True)
+    w = window(window_name, length)
+    spec = np.fft.rfft(segs * w, axis=-1)
+    density = (spec.real ** 2 + spec.imag ** 2).mean(axis=-2)
+    density /= (w * w).sum() / dt
+    density[..., 1:] *= 2
+    if length % 2 == 0:
+        density[..., -1] /= 2
+    return frequencies(length, dt), density
+
+
+class SpectrumAverager():
+    """
+    Averages the power spectra of a stream of captures.  Averaging power rather
+        than complex spectra keeps signals that aren't locked to the trigger.
+
+    mode -> "linear" weighs every capture equally, "exponential" follows
+        changes with a weight of <alpha> for the newest capture.
+    """
+    def __init__(self, dt, window_name="hann", mode="linear", alpha=.1, nfft=None):
+        if mode not in ("linear", "exponential"):
+            raise ValueError("mode must be linear or exponential.")
+        self.dt = dt
+        self.window_name = window_name
+        self.mode = mode
+        self.alpha = alpha
+        self.nfft = nfft
+        self.power = None
+        self.count = 0
+        self.freqs = None
+
+    def add(self, data):
+        """
+        Add a capture, or a 2-D array of them (e.g. both channels).  Every
+            capture added must have the same shape.
+        """
+        self.freqs, spec = transform(data, self.dt, self.window_name, self.nfft)
+        power = spec.real ** 2 + spec.imag ** 2
+        self.count += 1
+        if self.power is None:
+            self.power = power
+        elif self.mode == "linear":
+            self.power += (power - self.power) / self.count
+        else:
+            self.power += self.alpha * (power - self.power)
+
+    def addFrame(self, frame, sources=("CHAN1", "CHAN2")):
+        """
+        Add the <sources> of a capture.Frame as one 2-D capture.
+        """
+        self.add(np.vstack([frame.waveforms[source] for source in sources]))
+
+    def magnitude(self, db=False):
+        """
+        returns (frequencies, averaged amplitude in volts, or dBV if db is True)
+        """
+        mag = np.sqrt(self.power)
+        if db:
+            with np.errstate(divide="ignore"):
+                mag = 20 * np.log10(mag)
+        return self.freqs, mag
+
+    def reset(self):
+        self.power = None
+        self.count = 0
+
+
+def spectrumFrame(frame, dt, window_name="hann", db=False):
+    """
+    Magnitude spectra of every waveform in a capture.Frame, transformed together.
+    returns (frequencies, {source: amplitude})
+    """
+    sources = sorted(frame.waveforms)
+    f, mag = magnitude(np.vstack([frame.waveforms[source] for source in sources]), dt, window_name, db=db)
+    return f, dict(zip(sources, mag))
@@ -0,0 +1,133 @@
+"""
+timeaxis.py
+
+The x values of a waveform, kept as a start time, a step and a length rather
+    than as an array.  A long memory record has up to 1M points, and every
+    capture with the same timebase settings has the same x values, so the
+    array is only made when something really needs it.
+
+    >>> x = r.getTimebase()
+    >>> x[0], x[-1], x.step
+    >>> np.asarray(x)
+
+Anything else an array can do, arithmetic (x * 1e3), numpy functions, fancy
+    indexing (x[mask]) and array methods (x.max()), works on the array, which
+    is made (once) for it, so a TimeAxis can be used wherever getTimebase's
+    array used to be.
+"""
+from __future__ import division
+from numbers import Integral
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+
+SCREEN_POINTS = 600
+SCREEN_DIVISIONS = 12
+
+
+class TimeAxis(NDArrayOperatorsMixin):
+
+    def __init__(self, start, step, length):
+        """
+        start -> time of the first sample in seconds, relative to the trigger.
+        step -> seconds between samples.
+        length -> number of samples.
+        """
+        self.start = start
+        self.step = step
+        self.length = length
+        self._array = None
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        """
+        An int gives the time of that sample, a slice gives another TimeAxis, and
+            anything else (index arrays, masks, ...) indexes the array.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            length = max(0, (stop - start + step - (1 if step > 0 else -1)) // step)
+            return TimeAxis(self.start + start * self.step, self.step * step, length)
+        if not isinstance(key, Integral):
+            return self.array()[key]
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("TimeAxis index out of range")
+        return self.start + key * self.step
+
+    def take(self, indices):
+        """
+        The times of the samples at <indices>, without making the whole array.
+        """
+        return self.start + np.asarray(indices) * self.step
+
+    def index(self, t):
+        """
+        Index of the sample closest to time <t>.
+        """
+        return int(min(max(round((t - self.start) / self.step), 0), self.length - 1))
+
+    @property
+    def stop(self):
+        """
+        Time of the last sample.
+        """
+        return self.start + (self.length - 1) * self.step
+
+    @property
+    def sampling_rate(self):
+        return 1 / self.step
+
+    def array(self):
+        """
+        The axis as a read only float64 array, made the first time it's asked for.
+        """
+        if self._array is None:
+            self._array = self.take(np.arange(self.length))
+            self._array.flags.writeable = False
+        return self._array
+
+    def __array__(self, dtype=None, copy=None):
+        a = self.array()
+        return a if dtype is None else a.astype(dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        # arithmetic and ufuncs are done on the array
+        inputs = tuple(x.array() if isinstance(x, TimeAxis) else x for x in inputs)
+        out = kwargs.get("out", ())
+        if any(isinstance(x, TimeAxis) for x in out):
+            # axes are shared, so x += 1 makes x a new array instead of changing the axis
+            if len(out) > 1:
+                return NotImplemented
+            del kwargs["out"]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __getattr__(self, name):
+        # array attributes and methods (shape, dtype, min, ...) come from the array
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.array(), name)
+
+    def __iter__(self):
+        return iter(self.array())
+
+    def __repr__(self):
+        return "TimeAxis(start={!r}, step={!r}, length={!r})".format(self.start, self.step, self.length)
+
+
+def screenAxis(time_scale, time_offset=0.0):
+    """
+    The axis of a normal 600 point record, 50 points per division.
+    """
+    return centeredAxis(time_scale * SCREEN_DIVISIONS / SCREEN_POINTS, time_offset, SCREEN_POINTS)
+
+
+def centeredAxis(step, time_offset, length):
+    """
+    An axis of <length> samples <step> apart, centered on <time_offset>, which
+        is where the scope puts the middle of its record.
+    """
+    return TimeAxis(time_offset - length / 2 * step, step, length)
@@ -0,0 +1,338 @@
+"""
+tracing.py
+
+Finds out which SCPI commands a program spends its time on.  While tracing
+    is on, every exchange with the scope (a command written plus any reads of
+    its response) is recorded under the command's mnemonic: how many times it
+    was sent, the bytes sent and received, how long the caller waited for the
+    connection lock, and how long the usb transfers took.  Optionally the last
+    N exchanges are kept in a trace as well.
+
+    >>> with profile(r) as tracer:
+    ...     for i in range(100):
+    ...         r.getWaveforms()
+    >>> print(tracer.report())
+    >>> tracer.dump("trace.json")
+
+Tracing works by swapping the connection's instrument and lock for timed
+    stand-ins, and putting the originals back when it is turned off, so a
+    connection that isn't traced runs exactly the same code as before.
+"""
+from __future__ import division
+from bisect import bisect_right
+from collections import deque
+from contextlib import contextmanager
+from timeit import default_timer as clock
+import json
+import time
+
+
+# histogram bin edges in seconds, 4 per decade from 1us to 100s
+EDGES = [10 ** (k / 4) for k in range(-24, 9)]
+
+
+class Histogram():
+    """
+    Log spaced histogram of durations.  counts[0] is below EDGES[0] and
+        counts[-1] is at or above EDGES[-1].
+    """
+    def __init__(self):
+        self.counts = [0] * (len(EDGES) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_right(EDGES, seconds)] += 1
+        self.total += seconds
+        self.n += 1
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """
+        Upper edge of the bin holding the <p>th percentile, so at most 78% high.
+        """
+        if not self.n:
+            return float("nan")
+        target = p / 100 * self.n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(EDGES[i], self.max) if i < len(EDGES) else self.max
+        return self.max
+
+    def summary(self):
+        return {"total": self.total,
+                "mean": self.total / self.n if self.n else float("nan"),
+                "min": self.min if self.n else float("nan"),
+                "max": self.max,
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99),
+                "counts": self.counts}
+
+
+class CommandStats():
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.wire = Histogram()
+        self.lock_wait = Histogram()
+
+    def summary(self):
+        return {"count": self.count,
+                "errors": self.errors,
+                "bytes_out": self.bytes_out,
+                "bytes_in": self.bytes_in,
+                "wire": self.wire.summary(),
+                "lock_wait": self.lock_wait.summary()}
+
+
+def mnemonic(message):
+    """
+    The command headers of <message> without arguments, ":WAV:DATA? CHAN1" ->
+        ":WAV:DATA?".  The parts of a ";" compound message are kept together.
+    """
+    if isinstance(message, bytes):
+        message = message.decode("ascii", "replace")
+    return ";".join(part.strip().split(" ")[0].upper() for part in message.split(";"))
+
+
+class Tracer():
+
+    def __init__(self, trace_length=0):
+        """
+        trace_length -> how many of the latest exchanges to keep in self.trace,
+            0 keeps none.
+        """
+        self.stats = {}
+        self.trace = deque(maxlen=trace_length) if trace_length else None
+        self.started = time.time()
+
+    def record(self, name, kind, bytes_out, bytes_in, lock_wait, wire, timestamp, error=None):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = CommandStats()
+        stats.count += 1
+        stats.bytes_out += bytes_out
+        stats.bytes_in += bytes_in
+        stats.wire.add(wire)
+        stats.lock_wait.add(lock_wait)
+        if error is not None:
+            stats.errors += 1
+        if self.trace is not None:
+            self.trace.append({"timestamp": timestamp, "command": name, "kind": kind,
+                               "bytes_out": bytes_out, "bytes_in": bytes_in,
+                               "lock_wait": lock_wait, "wire": wire, "error": error})
+
+    def reset(self):
+        self.stats.clear()
+        if self.trace is not None:
+            self.trace.clear()
+        self.started = time.time()
+
+    def summary(self):
+        """
+        {"started": ..., "commands": {mnemonic: stats}, "trace": [...]}
+        """
+        return {"started": self.started,
+                "edges": EDGES,
+                "commands": dict((name, stats.summary()) for name, stats in self.stats.items()),
+                "trace": list(self.trace) if self.trace is not None else []}
+
+    def dump(self, path):
+        """
+        Write the summary to <path> as JSON.
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=1)
+
+    def report(self):
+        """
+        A table of the commands, the ones that took the most time first.
+        """
+        rows = sorted(self.stats.items(), key=lambda item: -item[1].wire.total)
+        lines = ["{:<32} {:>7} {:>10} {:>10} {:>10} {:>10} {:>12}".format(
+            "command", "count", "total ms", "mean ms", "p90 ms", "wait ms", "bytes in")]
+        for name, stats in rows:
+            wire = stats.wire
+            lines.append("{:<32} {:>7} {:>10.2f} {:>10.3f} {:>10.3f} {:>10.2f} {:>12}".format(
+                name[:32], stats.count, wire.total * 1e3, wire.total / stats.count * 1e3,
+                wire.percentile(90) * 1e3, stats.lock_wait.total * 1e3, stats.bytes_in))
+        return "\n".join(lines)
+
+
+class TracingInstrument():
+    """
+    Stands in for a connection's instrument (usbtmc.Instrument, SimInstrument)
+        and times every call made to it.  Every write or query starts a new
+        exchange, reads are added to the exchange they belong to, and the
+        exchange is recorded when the next one starts or the lock is let go.
+    Only used while the connection's lock is held, like the instrument itself.
+    """
+    def __init__(self, instr, tracer):
+        self.instr = instr
+        self.tracer = tracer
+        self.lock_wait = 0.0
+        self.current = None
+
+    def __getattr__(self, name):
+        if name == "instr":
+            raise AttributeError(name)
+        return getattr(self.instr, name)
+
+    def begin(self, message, kind):
+        self.finish()
+        self.current = {"name": mnemonic(message), "kind": kind, "bytes_out": len(message),
+                        "bytes_in": 0, "lock_wait": self.lock_wait, "wire": 0.0,
+                        "timestamp": time.time(), "error": None}
+        self.lock_wait = 0.0
+
+    def finish(self):
+        current = self.current
+        if current is not None:
+            self.current = None
+            self.tracer.record(**current)
+
+    def timed(self, func, *args):
+        if self.current is None:
+            self.begin("<read>", "read")
+        current = self.current
+        start = clock()
+        try:
+            result = func(*args)
+        except Exception as e:
+            current["error"] = repr(e)
+            raise
+        finally:
+            current["wire"] += clock() - start
+        if result is not None and not isinstance(result, (int, float)):
+            current["bytes_in"] += len(result)
+        return result
+
+    def write(self, message, *args):
+        self.begin(message, "write")
+        return self.timed(self.instr.write, message, *args)
+
+    def write_raw(self, data):
+        self.begin(data, "write")
+        return self.timed(self.instr.write_raw, data)
+
+    def ask(self, message, *args):
+        self.begin(message, "ask")
+        return self.timed(self.instr.ask, message, *args)
+
+    def ask_raw(self, message, *args):
+        self.begin(message, "ask")
+        return self.timed(self.instr.ask_raw, message, *args)
+
+    def read(self, *args):
+        return self.timed(self.instr.read, *args)
+
+    def read_raw(self, *args):
+        return self.timed(self.instr.read_raw, *args)
+
+
+class TimedLock():
+    """
+    Stands in for a connection's lock, measuring how long it took to get.  The
+        wait is charged to the first exchange made while holding it.
+    """
+    def __init__(self, lock, instr):
+        self.lock = lock
+        self.instr = instr
+        self.depth = 0
+
+    def acquire(self, *args, **kwargs):
+        start = clock()
+        acquired = self.lock.acquire(*args, **kwargs)
+        if acquired:
+            self.depth += 1
+            if self.depth == 1:
+                self.instr.lock_wait += clock() - start
+        return acquired
+
+    def release(self):
+        if self.depth == 1:
+            self.instr.finish()
+        self.depth -= 1
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def connectionChain(target):
+    """
+    [wrappers..., connection] for a Rigol, a connection, or a wrapper of one
+        like SettingsCache.  The connection is the one that has the instrument.
+    """
+    # connections and their wrappers have a lock, a Rigol doesn't
+    dev = target if "lock" in vars(target) else target.dev
+    chain = [dev]
+    while "instr" not in vars(dev):
+        dev = dev.dev
+        chain.append(dev)
+    return chain
+
+
+def enable(target, trace_length=0):
+    """
+    Start tracing the connection of <target>, a Rigol or a connection.
+    returns the Tracer, which is also kept as the connection's tracer attribute.
+    """
+    chain = connectionChain(target)
+    con = chain[-1]
+    if isinstance(con.instr, TracingInstrument):
+        return con.instr.tracer
+    tracer = Tracer(trace_length)
+    instr = TracingInstrument(con.instr, tracer)
+    lock = TimedLock(con.lock, instr)
+    for dev in chain:
+        if vars(dev).get("lock") is con.lock:
+            dev.lock = lock
+    con.instr = instr
+    con.tracer = tracer
+    return tracer
+
+
+def disable(target):
+    """
+    Stop tracing the connection of <target>.
+    returns the Tracer that was recording it, or None if it wasn't traced.
+    """
+    chain = connectionChain(target)
+    con = chain[-1]
+    if not isinstance(con.instr, TracingInstrument):
+        return None
+    instr = con.instr
+    instr.finish()
+    lock = con.lock
+    for dev in chain:
+        if vars(dev).get("lock") is lock:
+            dev.lock = lock.lock
+    con.instr = instr.instr
+    del con.tracer
+    return instr.tracer
+
+
+@contextmanager
+def profile(target, trace_length=0):
+    """
+    Trace the connection of <target> for the duration of a with block.
+    """
+    tracer = enable(target, trace_length)
+    try:
+        yield tracer
+    finally:
+        disable(target)
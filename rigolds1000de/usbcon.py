@@ -10,11 +10,62 @@ Add more classes to add more backends.
 
 Written and tested in python2.7 on Ubuntu 15.10
 """
-import usbtmc
 from multiprocessing import RLock
+from timeit import default_timer as clock
+import json
+import os
+try:
+    import usbtmc
+except ImportError:
+    usbtmc = None  # only the simulated backend (simcon.py) is usable
+import numpy as np
 
 __author__ = "Brian Perrett"
 
+# where the devices found by the last enumeration are remembered
+DEVICE_CACHE = os.path.join(os.path.expanduser("~"), ".rigolds1000de", "devices.json")
+
+
+def loadDeviceCache(path=DEVICE_CACHE):
+    """
+    The devices saved by saveDeviceCache, as a list of deviceEntry dictionaries.
+        Empty if there is no cache or it can't be read.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return []
+
+
+def deviceEntry(dev):
+    """
+    The ids and names of a usb device from usbtmc.list_devices as a dictionary.
+    Names we don't have permission to read are left as None.
+    """
+    entry = {"idVendor": dev.idVendor, "idProduct": dev.idProduct}
+    for key, name in (("iSerial", "serial_number"), ("manufacturer", "manufacturer"), ("product", "product")):
+        try:
+            entry[key] = getattr(dev, name)
+        except (ValueError, IOError):
+            entry[key] = None
+    return entry
+
+
+def saveDeviceCache(entries, path=DEVICE_CACHE):
+    """
+    Remember <entries> (from deviceEntry) so that the next connect doesn't have
+        to enumerate the bus.  Failing to write the cache isn't an error.
+    """
+    try:
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, "w") as f:
+            json.dump(entries, f)
+    except (IOError, OSError):
+        pass
+
 
 class UsbCon():
     """
@@ -23,29 +74,83 @@ class UsbCon():
         abstraction layer so that in the future, I can write other backends
         to support other os's.  May need to make a pyvisa backend, for example.
     """
-    def __init__(self, idProduct=None, idVendor=None):
+    def __init__(self, idProduct=None, idVendor=None, max_compound=1, iSerial=None,
+                 identify=True, device_cache=DEVICE_CACHE):
         """
+        max_compound -> how many queries ask_many may join into a single ";"
+            separated message.  1 sends each query on its own.
+        iSerial -> serial number of the device to open, for when several devices
+            share the same product and vendor ids.
+        identify -> ask and print *IDN? once connected.  False saves a round trip.
+        device_cache -> file the devices found on the bus are remembered in, so
+            later connects can skip enumerating it.  None never uses a cache.
+        The seconds spent in each part of connecting are kept in connect_times.
         """
+        self.max_compound = max_compound
+        if usbtmc is None:
+            raise ImportError("python-usbtmc is required for the usbtmc backend.")
         self.lock = RLock()
-        self.instr = self.connect(idProduct, idVendor)
-        print("Asking *IDN? returns: {}".format(self.ask("*IDN?")))
+        self.device_cache = device_cache
+        self.connect_times = {}
+        start = clock()
+        self.instr = self.connect(idProduct, idVendor, iSerial)
+        self.connect_times["open"] = clock() - start
+        if identify:
+            start = clock()
+            print("Asking *IDN? returns: {}".format(self.ask("*IDN?")))
+            self.connect_times["identify"] = clock() - start
 
-    def connect(self, idProduct=None, idVendor=None):
+    def connect(self, idProduct=None, idVendor=None, iSerial=None):
         """
         if either idProduct or idVendor are None, query the user for what to connect to.
+        The given ids, or the devices remembered in the device cache, are tried
+            first.  The bus is only enumerated (once) if that fails.
         """
-        if idProduct is None or idVendor is None:
-            for dev in usbtmc.list_devices():
-                print("1: {} - {}".format(dev.manufacturer, dev.product))
-            dev_con = raw_input("Enter the number of the device you want to connect to: ")
-            dev_chosen = usbtmc.list_devices()[int(dev_con) - 1]
-            product_id = dev_chosen.idProduct
-            vendor_id = dev_chosen.idVendor
-        for dev in usbtmc.list_devices():
-            if dev.idProduct == product_id and dev.idVendor == vendor_id:
+        cached = loadDeviceCache(self.device_cache) if self.device_cache is not None else []
+        if cached or (idProduct is not None and idVendor is not None):
+            try:
+                return self.open(cached, idProduct, idVendor, iSerial)
+            except Exception:
+                # unplugged, or a different device than last time, look again
+                pass
+        devices = usbtmc.list_devices()
+        entries = [deviceEntry(dev) for dev in devices]
+        if self.device_cache is not None:
+            saveDeviceCache(entries, self.device_cache)
+        for dev, entry in zip(devices, entries):
+            if (idProduct is None or dev.idProduct == idProduct) and (idVendor is None or dev.idVendor == idVendor):
+                if iSerial is not None and entry["iSerial"] != iSerial:
+                    continue
                 if dev.is_kernel_driver_active(0):
                     dev.detach_kernel_driver(0)
-        instr = usbtmc.Instrument(vendor_id, product_id)
+        return self.open(entries, idProduct, idVendor, iSerial)
+
+    def open(self, entries, idProduct=None, idVendor=None, iSerial=None):
+        """
+        Open the instrument, choosing from <entries> (see loadDeviceCache) when
+            the ids aren't given.
+        """
+        product_id = idProduct
+        vendor_id = idVendor
+        if idProduct is None or idVendor is None:
+            matches = [e for e in entries
+                       if (idProduct is None or e["idProduct"] == idProduct)
+                       and (idVendor is None or e["idVendor"] == idVendor)
+                       and (iSerial is None or e["iSerial"] == iSerial)]
+            if not matches:
+                raise IOError("No matching usb device.")
+            if len(matches) == 1:
+                dev_chosen = matches[0]
+            else:
+                for i, e in enumerate(matches):
+                    print("{}: {} - {}".format(i + 1, e["manufacturer"], e["product"]))
+                dev_con = raw_input("Enter the number of the device you want to connect to: ")
+                dev_chosen = matches[int(dev_con) - 1]
+            product_id = dev_chosen["idProduct"]
+            vendor_id = dev_chosen["idVendor"]
+            iSerial = dev_chosen["iSerial"]
+        instr = usbtmc.Instrument(vendor_id, product_id, iSerial)
+        instr.open()
         return instr
 
     def read(self, num=-1, encoding="utf-8"):
@@ -53,45 +158,113 @@ class UsbCon():
         Wrapping around the read method in usbtmc.Instrument
         """
         self.lock.acquire()
-        msg = self.instr.read(num, encoding)
-        self.lock.release()
-        return msg
+        try:
+            return self.instr.read(num, encoding)
+        finally:
+            self.lock.release()
 
     def write(self, message, encoding="utf-8"):
         """
         Wrapping around the write method in usbtmc.Instrument
         """
         self.lock.acquire()
-        msg = self.instr.write(message, encoding)
-        self.lock.release()
-        return msg
+        try:
+            return self.instr.write(message, encoding)
+        finally:
+            self.lock.release()
 
     def ask(self, message, num=-1, encoding="utf-8"):
         """
         Wrapping around the ask method in usbtmc.Instrument
         """
         self.lock.acquire()
-        msg = self.instr.ask(message, num, encoding)
-        self.lock.release()
-        return msg
+        try:
+            return self.instr.ask(message, num, encoding)
+        finally:
+            self.lock.release()
 
     def read_raw(self, num=-1):
         """
         Wrapping around the read_raw method in usbtmc.Instrument
         """
         self.lock.acquire()
-        msg = self.instr.read_raw(num)
-        self.lock.release()
-        return msg
+        try:
+            return self.instr.read_raw(num)
+        finally:
+            self.lock.release()
 
     def ask_raw(self, msg, num=-1):
         """
         Wrapping around the ask_raw method in usbtmc.Instrument
         """
         self.lock.acquire()
-        msg = self.instr.ask_raw(msg, num)
-        self.lock.release()
-        return msg
+        try:
+            return self.instr.ask_raw(msg, num)
+        finally:
+            self.lock.release()
+
+    def ask_many(self, messages, encoding="utf-8"):
+        """
+        Asks every query in <messages> while only taking the lock once.
+        Up to max_compound queries are sent together as one ";" separated
+            message and the response is split back apart.
+        Returns the list of responses in the same order as <messages>.
+        """
+        responses = []
+        self.lock.acquire()
+        try:
+            for i in range(0, len(messages), self.max_compound):
+                group = messages[i:i + self.max_compound]
+                msg = self.instr.ask(";".join(group), -1, encoding)
+                parts = msg.split(";") if len(group) > 1 else [msg]
+                if len(parts) != len(group):
+                    raise IOError("Asked {} queries but got {} responses: {}".format(len(group), len(parts), msg))
+                responses.extend(parts)
+        finally:
+            self.lock.release()
+        return responses
+
+    def ask_block(self, message, out=None, done=None):
+        """
+        Asks a query that answers with an IEEE 488.2 definite length block
+            (#<n><n digit length><data>), such as :WAV:DATA?, and returns the data
+            sized by the length in the header.
+        The whole response is read with a single read_raw.  The DS1000 starts a
+            transfer over every time it is asked for more data (python-usbtmc's
+            rigol_quirk), so the block can't be read a piece at a time.
+        out -> optional uint8 array to copy into, at least as long as the block.
+        done -> optional function called as done(total_bytes) once the block has
+            been read.  There is no way to report on a transfer while it is in
+            progress, since it is a single read.
+        returns a uint8 numpy array of the data, without the header.
+        """
+        self.lock.acquire()
+        try:
+            self.instr.write(message)
+            response = self.instr.read_raw()
+        finally:
+            self.lock.release()
+        if response[:1] != b"#":
+            raise IOError("Expected a block response to {} but got {}".format(message, response[:16]))
+        ndigits = int(response[1:2])
+        if ndigits == 0:
+            # indefinite length, the block is everything that was sent
+            start = 2
+            total = len(response) - start
+        else:
+            start = 2 + ndigits
+            total = int(response[2:start])
+            if len(response) < start + total:
+                raise IOError("Block of {} bytes was cut short at {} bytes".format(total, len(response) - start))
+        data = np.frombuffer(response, np.uint8, total, start)
+        if out is not None:
+            if len(out) < total:
+                raise ValueError("out has room for {} bytes but the block is {} bytes".format(len(out), total))
+            out[:total] = data
+            data = out[:total]
+        if done is not None:
+            done(total)
+        return data
 
 
 def testConnect():
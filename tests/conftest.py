@@ -0,0 +1,9 @@
+"""
+The modules of rigolds1000de import each other by name (import usbcon as uc),
+    so the package directory is put on the path the same way running them
+    from inside it would.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rigolds1000de"))
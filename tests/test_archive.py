@@ -0,0 +1,89 @@
+import gc
+import os
+import weakref
+import numpy as np
+import pytest
+import archive
+import rigol
+
+
+@pytest.fixture
+def scope():
+    return rigol.Rigol("sim")
+
+
+def test_round_trip(tmp_path, scope):
+    path = str(tmp_path / "run.rga")
+    frames = []
+    with archive.ArchiveWriter(path) as w:
+        for i in range(3):
+            frame = scope.getCaptures(["CHAN1", "CHAN2"])
+            frames.append(frame)
+            for source in ("CHAN1", "CHAN2"):
+                w.append(frame.waveforms[source])
+    with archive.ArchiveReader(path) as a:
+        assert len(a) == 6
+        assert list(a.select("CHAN2")) == [1, 3, 5]
+        for i, frame in enumerate(frames):
+            for j, source in enumerate(("CHAN1", "CHAN2")):
+                original = frame.waveforms[source]
+                cap = a[2 * i + j]
+                assert cap.source == source
+                assert cap.timestamp == original.timestamp
+                np.testing.assert_array_equal(cap.settings, original.settings)
+                np.testing.assert_array_equal(cap.raw, original.raw)
+                np.testing.assert_allclose(cap.volts, original.volts)
+
+
+def test_reader_follows_writer(tmp_path, scope):
+    path = str(tmp_path / "run.rga")
+    w = archive.ArchiveWriter(path)
+    w.capture(scope, ["CHAN1"])
+    a = archive.ArchiveReader(path)
+    assert len(a) == 1
+    w.capture(scope, ["CHAN1"])
+    w.close()
+    a.refresh()
+    assert len(a) == 2
+
+
+def test_index_grows_without_keeping_old_maps(tmp_path, scope):
+    path = str(tmp_path / "run.rga")
+    w = archive.ArchiveWriter(path)
+    w.capture(scope, ["CHAN1"])
+    a = archive.ArchiveReader(path)
+    old = weakref.ref(a.data)
+    for i in range(100):
+        w.capture(scope, ["CHAN1", "CHAN2"])
+    w.close()
+    a.refresh()
+    gc.collect()
+    assert old() is None
+    assert len(a) == 201
+    assert list(a.select("CHAN2")) == list(range(2, 201, 2))
+    assert np.all(np.diff(a.timestamps()) >= 0)
+    np.testing.assert_array_equal(a[200].raw, a.raw(200))
+
+
+def test_reopen_after_crash(tmp_path, scope):
+    path = str(tmp_path / "run.rga")
+    with archive.ArchiveWriter(path) as w:
+        w.capture(scope, ["CHAN1", "CHAN2"])
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 100)
+    with archive.ArchiveWriter(path) as w:
+        w.capture(scope, ["CHAN1"])
+    with archive.ArchiveReader(path) as a:
+        assert [cap.source for cap in a] == ["CHAN1", "CHAN1"]
+        assert os.path.getsize(path) == a.end
+
+
+def test_not_an_archive(tmp_path):
+    path = str(tmp_path / "other")
+    with open(path, "wb") as f:
+        f.write(b"something else entirely")
+    with pytest.raises(archive.ArchiveError):
+        archive.ArchiveReader(path)
+    with pytest.raises(archive.ArchiveError):
+        archive.ArchiveWriter(path)
@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+import asyncrigol
+import rigol
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+def test_open_loads_attributes():
+    async def main():
+        scope = await asyncrigol.AsyncRigol.open("sim")
+        try:
+            # already loaded, so nothing is asked from the event loop
+            assert "volt1_scale" in vars(scope.scope)
+            assert scope.volt1_scale == 1.0
+            data = await scope.getWaveform("CHAN1")
+            assert len(data) == 600
+        finally:
+            await scope.close()
+    run(main())
+
+
+def test_unloaded_attributes_are_not_asked_for_on_the_loop():
+    async def main():
+        scope = asyncrigol.AsyncRigol(rigol.Rigol("sim"))
+        try:
+            with pytest.raises(AttributeError):
+                scope.time_scale
+            await scope.refreshAttributes()
+            assert scope.time_scale == 5e-4
+        finally:
+            await scope.close()
+    run(main())
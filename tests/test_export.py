@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import capture
+import export
+import rigol
+
+h5py = pytest.importorskip("h5py")
+
+
+def long_capture(npoints, timestamp=0.0):
+    raw = np.arange(npoints, dtype=np.int64).astype("B")
+    return capture.Capture(raw, "CHAN1", timestamp, capture.Settings(1.0, 0.0, 1e-3, 0.0, 1e6))
+
+
+def test_hdf5_round_trip(tmp_path):
+    path = str(tmp_path / "run.h5")
+    r = rigol.Rigol("sim")
+    frames = []
+    with export.SessionExporter(path, chunk_captures=4) as ex:
+        for i in range(10):
+            frame = r.getCaptures(["CHAN1", "CHAN2"])
+            frames.append(frame)
+            for source in ("CHAN1", "CHAN2"):
+                ex.add(frame.waveforms[source])
+    with h5py.File(path, "r") as f:
+        for source in ("CHAN1", "CHAN2"):
+            group = f["{}/600".format(source)]
+            assert group["raw"].chunks == (4, 600)
+            np.testing.assert_array_equal(group["raw"][:],
+                                          [frame.waveforms[source].raw for frame in frames])
+            np.testing.assert_array_equal(group["timestamp"][:],
+                                          [frame.waveforms[source].timestamp for frame in frames])
+
+
+@pytest.mark.parametrize("dtype", [None, np.float64])
+def test_chunks_stay_small(tmp_path, dtype):
+    path = str(tmp_path / "run.h5")
+    cap = long_capture(1 << 20)
+    with export.SessionExporter(path, dtype=dtype) as ex:
+        ex.add(cap)
+        ex.add(cap)
+    with h5py.File(path, "r") as f:
+        waves = f["CHAN1/{}".format(len(cap))]["raw" if dtype is None else "volts"]
+        assert np.prod(waves.chunks) * waves.dtype.itemsize <= export.CHUNK_BYTES
+        assert waves.shape == (2, len(cap))
+        np.testing.assert_array_equal(waves[1], cap.raw if dtype is None else cap.volts)
+
+
+def test_parquet_index(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    h5_path = str(tmp_path / "run.h5")
+    index_path = str(tmp_path / "run.parquet")
+    with export.SessionExporter(h5_path, index_path, chunk_captures=4, index_group_rows=16) as ex:
+        for i in range(40):
+            ex.add(long_capture(600 if i % 2 else 1200, timestamp=float(i)))
+    index = pq.ParquetFile(index_path)
+    assert index.metadata.num_row_groups == 3
+    table = index.read().to_pydict()
+    assert table["capture"] == list(range(40))
+    assert table["timestamp"] == [float(i) for i in range(40)]
+    with h5py.File(h5_path, "r") as f:
+        for i in (0, 1, 38, 39):
+            raw = f[table["dataset"][i]]["raw"][table["row"][i]]
+            np.testing.assert_array_equal(raw, long_capture(table["npoints"][i]).raw)
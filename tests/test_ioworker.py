@@ -0,0 +1,58 @@
+import threading
+import time
+import ioworker
+import rigol
+import simcon
+
+
+def test_priority_order():
+    worker = ioworker.IOWorker(simcon.SimCon())
+    lock = ioworker.WorkerLock(worker)
+    order = []
+    lock.acquire()
+    try:
+        futures = [worker.submit(ioworker.BULK, order.append, "bulk"),
+                   worker.submit(ioworker.QUERY, order.append, "query"),
+                   worker.submit(ioworker.INTERACTIVE, order.append, "interactive")]
+    finally:
+        lock.release()
+    for future in futures:
+        future.result(5)
+    assert order == ["interactive", "query", "bulk"]
+    worker.close()
+
+
+def test_queued_queries_share_a_future():
+    worker = ioworker.IOWorker(simcon.SimCon())
+    lock = ioworker.WorkerLock(worker)
+    lock.acquire()
+    try:
+        a = worker.ask(":TIM:SCAL?")
+        b = worker.ask(":TIM:SCAL?")
+    finally:
+        lock.release()
+    assert a is b
+    assert float(a.result(5)) == 5e-4
+    worker.close()
+
+
+def test_waveform_loop_does_not_starve_queries():
+    r = rigol.Rigol("sim", threaded=True, latency=.002)
+    stop = threading.Event()
+
+    def loop():
+        while not stop.is_set():
+            r.getWaveforms()
+
+    thread = threading.Thread(target=loop)
+    thread.start()
+    try:
+        time.sleep(.1)
+        for i in range(5):
+            # at most one getWaveforms (a few latencies) ahead of it, the
+            #     timeout makes a starved query fail rather than hang
+            assert float(r.dev.worker.ask(":TIM:SCAL?").result(timeout=1)) == 5e-4
+    finally:
+        stop.set()
+        thread.join()
+        r.dev.close()
@@ -0,0 +1,23 @@
+import pytest
+import manager
+
+
+def test_acquire():
+    m = manager.RigolManager.simulated(3)
+    try:
+        fs = m.acquire(["CHAN1"])
+        assert sorted(fs.frames) == ["SIM0000000001", "SIM0000000002", "SIM0000000003"]
+        assert all(len(f.waveforms["CHAN1"]) == 600 for f in fs.frames.values())
+        assert fs.skew >= 0
+        assert [f.index for f in m.iterAcquire(["CHAN1"], count=2)] == [1, 2]
+    finally:
+        m.close()
+
+
+def test_empty_rack():
+    m = manager.RigolManager({})
+    try:
+        with pytest.raises(IOError):
+            m.acquire()
+    finally:
+        m.close()
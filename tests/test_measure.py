@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import measure
+import rigol
+
+DT = 1e-6
+T = np.arange(10000) * DT
+
+
+def sine(noise=0.0, seed=0):
+    v = np.sin(2 * np.pi * 1e3 * T)
+    return v + np.random.RandomState(seed).normal(0, noise, len(T))
+
+
+def test_levels():
+    m = measure.measure(sine(), DT)
+    assert m["vmax"] == pytest.approx(1, abs=1e-3)
+    assert m["vmin"] == pytest.approx(-1, abs=1e-3)
+    assert m["vpp"] == pytest.approx(2, abs=1e-3)
+    assert m["vrms"] == pytest.approx(2 ** -.5, rel=1e-3)
+    assert m["vavg"] == pytest.approx(0, abs=1e-3)
+
+
+@pytest.mark.parametrize("noise", [0, .01, .05])
+def test_frequency_with_noise(noise):
+    m = measure.measure(sine(noise), DT)
+    assert m["freq"] == pytest.approx(1e3, rel=.01)
+    assert m["pduty"] == pytest.approx(.5, abs=.02)
+
+
+def test_pulse():
+    phase = (T * 1e3) % 1
+    # 25% duty with 10 sample linear edges
+    v = np.clip(np.minimum(phase, .25 - phase + .01) * 100, 0, 1)
+    m = measure.measure(v, DT)
+    assert m["freq"] == pytest.approx(1e3, rel=1e-3)
+    assert m["pwidth"] == pytest.approx(250e-6, rel=.05)
+    assert m["pduty"] == pytest.approx(.25, rel=.05)
+    # 10% to 90% of a 10 sample edge
+    assert m["rise"] == pytest.approx(8e-6, rel=.05)
+    assert m["fall"] == pytest.approx(8e-6, rel=.05)
+
+
+def test_rows_match_single():
+    data = np.vstack([sine(.01, seed) for seed in range(3)])
+    together = measure.measure(data, DT)
+    for i in range(3):
+        alone = measure.measure(data[i], DT)
+        for name in measure.MEASUREMENTS:
+            assert together[name][i] == pytest.approx(alone[name], nan_ok=True)
+
+
+def test_flat_has_no_edges():
+    m = measure.measure(np.zeros(100), DT)
+    assert np.isnan(m["freq"])
+    assert np.isnan(m["rise"])
+
+
+def test_simulated_long_record():
+    r = rigol.Rigol("sim")
+    r.stop()
+    r.waveformPointsMode("RAW")
+    c = r.getCapture("CHAN1")
+    assert len(c.raw) > 600
+    assert measure.measure(c.volts, c.time.step)["freq"] == pytest.approx(1e3, rel=.01)
+
+
+def test_measure_frame_of_captures():
+    r = rigol.Rigol("sim")
+    frame = r.getCaptures(["CHAN1", "CHAN2"])
+    dt = frame.waveforms["CHAN1"].time.step
+    m = measure.measureFrame(frame, dt)
+    assert m["CHAN1"]["freq"] == pytest.approx(1e3, rel=.02)
+    assert m["CHAN2"]["freq"] == pytest.approx(2e3, rel=.02)
+    together = measure.measureFrames([frame, frame], "CHAN2", dt)
+    assert together["freq"][1] == pytest.approx(m["CHAN2"]["freq"])
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import rigol
+import tracing
+
+
+@pytest.fixture
+def scope():
+    r = rigol.Rigol("sim")
+    r.dev.write(":CHAN1:SCAL 0.5")
+    r.dev.write(":CHAN1:OFFS 0.25")
+    r.refreshAttributes()
+    return r
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_convert_voltages(scope, dtype):
+    data = np.arange(256, dtype=np.uint8)
+    gain, bias = scope.voltageAffine("CHAN1")
+    expected = data * gain + bias
+    new = scope.convertVoltages(data, "CHAN1", dtype=dtype)
+    assert new.dtype == dtype
+    np.testing.assert_allclose(new, expected, rtol=1e-6, atol=1e-6)
+    out = np.empty(256, dtype)
+    assert scope.convertVoltages(data, "CHAN1", out=out) is out
+    np.testing.assert_allclose(out, expected, rtol=1e-6, atol=1e-6)
+    pooled = scope.convertVoltages(data, "CHAN1", dtype=dtype, pooled=True)
+    assert np.shares_memory(pooled, scope.waveformBuffer("CHAN1", 256, dtype))
+    np.testing.assert_allclose(pooled, expected, rtol=1e-6, atol=1e-6)
+
+
+def test_waveform_round_trip(scope):
+    # the simulator's 1 V sine reads back within a count of quantization
+    v = scope.getWaveform("CHAN1")
+    assert v.max() == pytest.approx(1, abs=.1)
+    assert v.min() == pytest.approx(-1, abs=.1)
+
+
+def test_channel_queries_dont_load_every_setting():
+    r = rigol.Rigol("sim")
+    with tracing.profile(r) as tracer:
+        assert r.askChannelScale(1) == 1.0
+        assert r.askChannelOffset(2) == 0.0
+    assert sorted(tracer.stats) == [":CHAN1:SCAL?", ":CHAN2:OFFS?"]
+    assert "time_scale" not in vars(r)
+
+
+@pytest.mark.parametrize("max_compound, exchanges", [(1, 7), (16, 1)])
+def test_refresh_attributes_queries(max_compound, exchanges):
+    r = rigol.Rigol("sim", max_compound=max_compound)
+    with tracing.profile(r) as tracer:
+        r.refreshAttributes()
+    assert sum(stats.count for stats in tracer.stats.values()) == exchanges
+    assert r.time_scale == 5e-4
+
+
+def test_refresh_attributes_delayed():
+    r = rigol.Rigol("sim")
+    r.dev.write(":TIM:MODE DEL")
+    r.dev.write(":TIM:DEL:SCAL 0.00001")
+    r.refreshAttributes()
+    assert r.time_scale == 1e-5
+
+
+def test_ask_batch_takes_a_generator():
+    r = rigol.Rigol("sim")
+    answers = r.askBatch(q for q in [":TIM:SCAL?", ":CHAN1:SCAL?"])
+    assert answers == {":TIM:SCAL?": 5e-4, ":CHAN1:SCAL?": 1.0}
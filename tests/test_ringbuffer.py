@@ -0,0 +1,60 @@
+import multiprocessing
+import numpy as np
+import pytest
+import ringbuffer
+
+
+def test_latest_frame():
+    ring = ringbuffer.WaveformRing(slots=3, channels=2, max_points=16)
+    assert ring.latest() is None
+    for i in range(5):
+        seq = ring.put([np.full(8, i, float), None])
+    seq_read, waveforms = ring.latest()
+    assert seq_read == seq == 5
+    np.testing.assert_array_equal(waveforms[0], np.full(8, 4.0))
+    assert waveforms[1] is None
+    assert ring.latest(seq) is None
+
+
+def test_copies_out_of_shared_memory():
+    ring = ringbuffer.WaveformRing(slots=2, channels=1, max_points=4)
+    ring.put([np.arange(4.0)])
+    _, (first,) = ring.latest()
+    ring.put([np.zeros(4)])
+    ring.put([np.ones(4)])
+    np.testing.assert_array_equal(first, np.arange(4.0))
+
+
+def test_too_long():
+    ring = ringbuffer.WaveformRing(slots=2, channels=1, max_points=4)
+    with pytest.raises(ValueError):
+        ring.put([np.zeros(5)])
+
+
+def writer(ring, count):
+    for i in range(count):
+        ring.put([np.full(100, i, float), np.full(50, -i, float)])
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_across_processes():
+    ring = ringbuffer.WaveformRing(slots=4, channels=2, max_points=128)
+    process = multiprocessing.get_context("fork").Process(target=writer, args=(ring, 200))
+    process.start()
+    seen = 0
+    while True:
+        # once the writer has exited nothing can change under the read
+        finished = not process.is_alive()
+        frame = ring.latest(seen)
+        if frame is None:
+            if finished:
+                break
+            continue
+        seq, (a, b) = frame
+        assert seq > seen
+        # every frame read whole, never a mix of two writes
+        assert len(a) == 100 and len(b) == 50
+        assert (a == seq - 1).all() and (b == 1 - seq).all()
+        seen = seq
+    process.join()
+    assert seen == 200
@@ -0,0 +1,84 @@
+import time
+import pytest
+import capture
+import rigol
+import scheduler
+
+
+class FakeScope():
+    """
+    Answers the trigger status it is given, and takes <latency> seconds to read.
+    """
+    def __init__(self, status="T'D", latency=0.0):
+        self.status = status
+        self.latency = latency
+        self.reads = 0
+
+    def askTriggerStatus(self):
+        return self.status
+
+    def getWaveforms(self, sources, index=0):
+        time.sleep(self.latency)
+        self.reads += 1
+        return capture.Frame(index, time.time(), dict((source, None) for source in sources))
+
+
+def test_subscriptions():
+    subs = scheduler.Subscriptions()
+    assert subs.subscribed() == []
+    subs.subscribe("CHAN2")
+    subs.subscribe("CHAN1")
+    assert subs.subscribed() == ["CHAN1", "CHAN2"]
+    subs.unsubscribe("CHAN1")
+    assert not subs.isSubscribed("CHAN1")
+    assert subs.subscribed() == ["CHAN2"]
+
+
+def test_reads_only_new_acquisitions():
+    scope = FakeScope("WAIT")
+    sched = scheduler.AcquisitionScheduler(scope)
+    assert sched.acquire(["CHAN1"]) is None
+    scope.status = "T'D"
+    assert sched.acquire(["CHAN1"]).index == 0
+    assert sched.acquire(["CHAN1"]).index == 1
+    # a stopped scope's last acquisition is read once
+    scope.status = "STOP"
+    assert sched.acquire(["CHAN1"]).index == 2
+    assert sched.acquire(["CHAN1"]) is None
+    assert sched.acquire([]) is None
+    assert scope.reads == 3
+
+
+def test_delay():
+    scope = FakeScope(latency=.02)
+    sched = scheduler.AcquisitionScheduler(scope, target_fps=1000, idle_fraction=.2, poll_interval=.05)
+    assert sched.delay() == .05
+    sched.acquire(["CHAN1"])
+    # far above what the reads allow, so only the idle share is waited
+    assert sched.delay() == pytest.approx(sched.latency / 4)
+    assert sched.latency >= .02
+    sched.target_fps = 10
+    sched.acquire(["CHAN1"])
+    # the rest of the 100ms period, less the read of at least 20ms
+    assert sched.latency / 4 < sched.delay() <= .08
+    scope.status = "WAIT"
+    sched.acquire(["CHAN1"])
+    assert sched.delay() == .05
+
+
+def test_run_with_simulator():
+    r = rigol.Rigol("sim", latency=.001)
+    subs = scheduler.Subscriptions()
+    subs.subscribe("CHAN1")
+    sched = scheduler.AcquisitionScheduler(r, target_fps=50)
+    frames = []
+    start = time.time()
+    sched.run(subs.subscribed, frames.append, stop=lambda: len(frames) == 3)
+    assert [frame.index for frame in frames] == [0, 1, 2]
+    assert list(frames[0].waveforms) == ["CHAN1"]
+    assert len(frames[0].waveforms["CHAN1"]) == 600
+    # paced at 50 fps, two waits between the three frames
+    assert time.time() - start >= .035
+    r.stop()
+    sched.run(subs.subscribed, frames.append, stop=lambda: len(frames) == 4)
+    assert sched.acquire(subs.subscribed()) is None
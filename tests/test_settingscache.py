@@ -0,0 +1,122 @@
+import threading
+import time
+import pytest
+import ioworker
+import rigol
+import settingscache
+import simcon
+
+
+@pytest.fixture
+def cache():
+    return settingscache.SettingsCache(simcon.SimCon())
+
+
+def test_hits_and_misses(cache):
+    assert cache.ask(":CHAN1:OFFS?") == "0.000e+00"
+    assert cache.ask(":CHAN1:OFFS?") == "0.000e+00"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_setters_are_remembered(cache):
+    cache.write(":DISP:BRIG 20")
+    assert cache.ask(":DISP:BRIG?") == "20"
+    assert cache.misses == 0
+    # the scope rounds scales, so they are asked for again
+    cache.write(":CHAN1:SCAL 0.3")
+    cache.ask(":CHAN1:SCAL?")
+    assert cache.misses == 1
+
+
+def test_clamped_offset_is_asked_for_again():
+    r = rigol.Rigol("sim", cache=True)
+    r.channelScale(1, .1)
+    r.channelOffset(1, 100)
+    assert r.volt1_offset == 2.0
+    assert float(r.dev.ask(":CHAN1:OFFS?")) == 2.0
+
+
+def test_dependents_and_dirty(cache):
+    cache.ask(":TIM:OFFS?")
+    cache.write(":TIM:SCAL 0.001")
+    assert ":TIM:OFFS" not in cache.values
+    cache.ask(":CHAN2:OFFS?")
+    cache.write("*RST")
+    assert cache.values == {}
+
+
+def test_volatile_queries_go_to_the_scope(cache):
+    cache.ask(":TRIG:STAT?")
+    cache.ask(":TRIG:STAT?")
+    assert cache.values == {}
+
+
+def test_ask_many(cache):
+    cache.ask(":CHAN1:OFFS?")
+    answers = cache.ask_many([":CHAN1:OFFS?", ":CHAN2:OFFS?", ":TRIG:STAT?"])
+    assert answers == ["0.000e+00", "0.000e+00", "T'D"]
+    assert cache.hits == 1
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_hit_does_not_wait_for_the_connection(threaded):
+    r = rigol.Rigol("sim", cache=True, threaded=threaded)
+    r.askChannelScale(1)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with r.dev.lock:
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    try:
+        held.wait(5)
+        start = time.time()
+        r.askChannelScale(1)
+        assert time.time() - start < 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def wait_for_queue(worker, length):
+    deadline = time.time() + 5
+    while worker.queue.qsize() < length:
+        assert time.time() < deadline
+        time.sleep(.001)
+
+
+def test_setters_go_ahead_of_waveform_reads():
+    sim = simcon.SimCon()
+    order = []
+    write = sim.write
+
+    def recorded(message, encoding="utf-8"):
+        order.append(message)
+        return write(message, encoding)
+
+    sim.write = recorded
+    con = ioworker.WorkerCon(sim)
+    cache = settingscache.SettingsCache(con)
+
+    def bulk():
+        with con.lock:
+            con.write(":WAV:POIN:MODE RAW")
+
+    con.lock.acquire()
+    try:
+        reader = threading.Thread(target=bulk)
+        reader.start()
+        wait_for_queue(con.worker, 1)
+        setter = threading.Thread(target=cache.write, args=(":DISP:BRIG 20",))
+        setter.start()
+        wait_for_queue(con.worker, 2)
+    finally:
+        con.lock.release()
+    reader.join(5)
+    setter.join(5)
+    assert order == [":DISP:BRIG 20", ":WAV:POIN:MODE RAW"]
+    con.close()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import rigol
+import simcon
+
+
+def test_partial_reads_start_over():
+    instr = simcon.SimInstrument()
+    instr.write(":TIM:SCAL?")
+    assert instr.read_raw(2) == b"5."
+    assert instr.read_raw(2) == b"5."
+    assert instr.read() == "5.000e-04"
+    with pytest.raises(simcon.SimTimeout):
+        instr.read_raw()
+
+
+def test_ask_block():
+    r = rigol.Rigol("sim")
+    seen = []
+    data = r.askWaveformBlock("CHAN1", done=seen.append)
+    assert len(data) == 600
+    assert seen == [600]
+    out = np.zeros(1000, np.uint8)
+    data = r.askWaveformBlock("CHAN1", out=out)
+    assert np.shares_memory(data, out)
+    with pytest.raises(ValueError):
+        r.askWaveformBlock("CHAN1", out=np.zeros(10, np.uint8))
+
+
+def test_long_record():
+    r = rigol.Rigol("sim")
+    v = r.getWaveformLong("CHAN1")
+    assert len(v) == 8192
+    assert np.abs(v).max() == pytest.approx(1, abs=.1)
+    assert r.askWaveformPointsMode() == "NORMAL"
+    r.waveformPointsMode("MAX")
+    c = r.getCaptureLong("CHAN1")
+    assert len(c) == 8192
+    assert r.askWaveformPointsMode() == "MAXIMUM"
+
+
+@pytest.mark.parametrize("mode", ["NORM", "MAX", "RAW"])
+def test_measurements_use_the_screen(mode):
+    r = rigol.Rigol("sim")
+    r.stop()
+    r.waveformPointsMode(mode)
+    assert r.measureFrequency(1) == pytest.approx(1e3, rel=.02)
+    assert r.measureFrequency(2) == pytest.approx(2e3, rel=.02)
+    assert r.measureVpp(1) == pytest.approx(2, abs=.1)
+
+
+def test_measure_all():
+    r = rigol.Rigol("sim")
+    m = r.measureAll(2)
+    assert m["freq"] == pytest.approx(2e3, rel=.02)
+    assert m["pduty"] == pytest.approx(.5, abs=.05)
+    assert np.isnan(m["pdelay"])
+    assert "pphase" not in m
+
+
+def test_phase_needs_newer_firmware():
+    r = rigol.Rigol("sim")
+    with pytest.raises(IOError):
+        r.measurePositivePhase(1)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import spectrum
+
+DT = 1e-3
+T = np.arange(1000) * DT
+
+
+def sine(amplitude=.7, frequency=50.0):
+    return amplitude * np.sin(2 * np.pi * frequency * T)
+
+
+@pytest.mark.parametrize("window_name", ["rect", "hann", "hamming", "blackman", "flattop"])
+def test_sine_peak_is_its_amplitude(window_name):
+    f, mag = spectrum.magnitude(sine(), DT, window_name)
+    assert f[np.argmax(mag)] == pytest.approx(50)
+    assert mag.max() == pytest.approx(.7, rel=1e-3)
+
+
+@pytest.mark.parametrize("nfft", [500, 2000])
+def test_nfft(nfft):
+    f, mag = spectrum.magnitude(sine(), DT, nfft=nfft)
+    assert len(f) == nfft // 2 + 1
+    assert f[np.argmax(mag)] == pytest.approx(50)
+    # zero padding spreads the same energy over more points, so only a
+    #     transform of fewer points keeps the full height
+    if nfft < len(T):
+        assert mag.max() == pytest.approx(.7, rel=1e-3)
+
+
+def test_welch_integrates_to_the_variance():
+    data = np.random.RandomState(0).normal(0, .3, 100000)
+    f, density = spectrum.welch(data, DT, length=512)
+    assert density.sum() * (f[1] - f[0]) == pytest.approx(data.var(), rel=.02)
+    f, density = spectrum.welch(sine(), DT, length=200)
+    assert density.sum() * (f[1] - f[0]) == pytest.approx(.7 ** 2 / 2, rel=.02)
+
+
+def test_rows_are_transformed_together():
+    data = np.vstack([sine(.5), sine(.25, 100)])
+    f, mag = spectrum.magnitude(data, DT)
+    assert mag[0].max() == pytest.approx(.5, rel=1e-3)
+    assert f[np.argmax(mag[1])] == pytest.approx(100)
+
+
+def test_caches_are_bounded():
+    for n in range(10, 10 + 2 * spectrum.CACHE_SIZE):
+        spectrum.window("hann", n)
+        spectrum.frequencies(n, DT)
+    assert len(spectrum._windows) == spectrum.CACHE_SIZE
+    assert len(spectrum._frequencies) == spectrum.CACHE_SIZE
+    w = spectrum.window("hann", 10 + 2 * spectrum.CACHE_SIZE - 1)
+    assert spectrum.window("hann", len(w)) is w
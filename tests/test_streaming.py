@@ -0,0 +1,24 @@
+import threading
+import time
+import rigol
+
+
+def test_count_and_order():
+    r = rigol.Rigol("sim")
+    frames = list(r.iterWaveforms(count=5, prefetch=2))
+    assert [f.index for f in frames] == list(range(5))
+    assert all(len(f.waveforms["CHAN1"]) == 600 for f in frames)
+
+
+def test_closing_stops_the_producer():
+    r = rigol.Rigol("sim")
+    before = set(threading.enumerate())
+    g = r.iterWaveforms(count=2, prefetch=1)
+    next(g)
+    # let the producer fill the queue and block on its last put
+    time.sleep(.2)
+    g.close()
+    started = [t for t in threading.enumerate() if t not in before]
+    for t in started:
+        t.join(1)
+    assert not any(t.is_alive() for t in started)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import rigol
+import timeaxis
+
+
+@pytest.fixture
+def axis():
+    return timeaxis.screenAxis(5e-4)
+
+
+def test_values(axis):
+    expected = (np.arange(600) - 300) * 1e-5
+    np.testing.assert_allclose(np.asarray(axis), expected)
+    assert axis[0] == pytest.approx(-3e-3)
+    assert axis[-1] == pytest.approx(expected[-1])
+    assert axis.index(0) == 300
+    with pytest.raises(IndexError):
+        axis[600]
+
+
+def test_slices_stay_lazy(axis):
+    part = axis[100:200:2]
+    assert isinstance(part, timeaxis.TimeAxis)
+    np.testing.assert_allclose(np.asarray(part), np.asarray(axis)[100:200:2])
+    np.testing.assert_allclose(np.asarray(axis[::-1]), np.asarray(axis)[::-1], atol=1e-15)
+
+
+def test_works_like_an_array(axis):
+    a = np.asarray(axis)
+    np.testing.assert_allclose(axis * 1e3, a * 1e3)
+    np.testing.assert_allclose(1e3 * axis, a * 1e3)
+    np.testing.assert_allclose(axis - axis[0], a - a[0])
+    np.testing.assert_allclose(np.sin(axis), np.sin(a))
+    np.testing.assert_allclose(axis[np.array([1, 2])], a[[1, 2]])
+    np.testing.assert_allclose(axis[axis > 0], a[a > 0])
+    assert axis.shape == (600,)
+    assert axis.max() == a.max()
+
+
+def test_in_place_leaves_the_shared_axis_alone():
+    r = rigol.Rigol("sim")
+    x = r.getTimebase()
+    x += 1
+    assert isinstance(x, np.ndarray)
+    assert r.getTimebase()[0] == pytest.approx(-3e-3)
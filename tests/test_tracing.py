@@ -0,0 +1,67 @@
+import json
+import pytest
+import rigol
+import settingscache
+import simcon
+import tracing
+
+
+def test_mnemonic():
+    assert tracing.mnemonic(":WAV:DATA? CHAN1") == ":WAV:DATA?"
+    assert tracing.mnemonic(b":chan1:scal 0.5") == ":CHAN1:SCAL"
+    assert tracing.mnemonic(":CHAN1:SCAL?;:CHAN2:SCAL?") == ":CHAN1:SCAL?;:CHAN2:SCAL?"
+
+
+@pytest.mark.parametrize("cache, threaded", [(False, False), (True, False), (True, True)])
+def test_counts_and_restore(cache, threaded):
+    r = rigol.Rigol("sim", cache=cache, threaded=threaded)
+    chain = tracing.connectionChain(r)
+    con = chain[-1]
+    instr = con.instr
+    locks = [dev.lock for dev in chain]
+    r.refreshAttributes()
+    try:
+        with tracing.profile(r, trace_length=3) as tracer:
+            assert tracing.enable(r) is tracer
+            r.getWaveforms(["CHAN1", "CHAN2"])
+            r.askChannelScale(1)
+            r.askChannelScale(1)
+            r.channelScale(1, .5)
+        waveforms = tracer.stats[":WAV:DATA?"]
+        assert waveforms.count == 2
+        assert waveforms.bytes_in == 2 * 610
+        assert waveforms.errors == 0
+        # behind the cache both queries are hits, but the setter's read back
+        #     is asked for again since the scope rounds scales
+        assert tracer.stats[":CHAN1:SCAL?"].count == (1 if cache else 3)
+        assert tracer.stats[":CHAN1:SCAL"].count == 1
+        assert [t["command"] for t in tracer.trace][-2:] == [":CHAN1:SCAL", ":CHAN1:SCAL?"]
+        assert ":WAV:DATA?" in tracer.report()
+    finally:
+        if threaded:
+            chain[-2].close()
+    assert con.instr is instr
+    assert [dev.lock for dev in chain] == locks
+    assert not hasattr(con, "tracer")
+    assert tracing.disable(r) is None
+
+
+def test_compound_queries():
+    con = simcon.SimCon(max_compound=2)
+    with tracing.profile(settingscache.SettingsCache(con)) as tracer:
+        con.ask_many([":CHAN1:SCAL?", ":CHAN2:SCAL?", ":TIM:SCAL?"])
+    assert sorted(tracer.stats) == [":CHAN1:SCAL?;:CHAN2:SCAL?", ":TIM:SCAL?"]
+
+
+def test_errors_and_dump(tmp_path):
+    con = simcon.SimCon()
+    with tracing.profile(con) as tracer:
+        with pytest.raises(simcon.SimTimeout):
+            con.ask(":NOT:A:SETTING?")
+        con.ask(":TIM:SCAL?")
+    assert tracer.stats[":NOT:A:SETTING?"].errors == 1
+    path = str(tmp_path / "trace.json")
+    tracer.dump(path)
+    with open(path) as f:
+        summary = json.load(f)
+    assert summary["commands"][":TIM:SCAL?"]["count"] == 1